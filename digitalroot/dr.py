@@ -1,16 +1,111 @@
 #!/usr/bin/env python3
+import time
+import argparse
+import numpy as np
 
-def digitalroot(number):
+# values per chunk when enumerating, bounds memory to a few arrays of this size
+CHUNK_SIZE = 1 << 22
+
+def check_base(base):
+    # base 1 would make every root a division by zero (base - 1)
+    if base < 2:
+        raise ValueError(f"Base must be at least 2, got {base}")
+
+def digitalroot(number, base=10):
+    check_base(base)
     if number == 0:
         return 0
     else:
-        return 1 + ((number -1) % 9)
+        return 1 + ((number - 1) % (base - 1))
+
+def digitalroots(numbers, base=10):
+    # digital roots of an int64/uint64 array, same dtype out
+    check_base(base)
+    numbers = np.asarray(numbers)
+    if numbers.dtype.kind == 'i' and (numbers < 0).any():
+        raise ValueError("Digital roots are only defined for non-negative numbers")
+    one = numbers.dtype.type(1)
+    # n - 1 wraps around for n == 0 on unsigned arrays, masked out anyway
+    with np.errstate(over='ignore'):
+        roots = one + (numbers - one) % numbers.dtype.type(base - 1)
+    return np.where(numbers == 0, numbers.dtype.type(0), roots)
+
+def iter_roots(start, stop, base=10, chunk_size=CHUNK_SIZE):
+    # digital roots of range(start, stop) as a series of arrays
+    dtype = np.uint64 if stop > np.iinfo(np.int64).max else np.int64
+    for chunk_start in range(start, stop, chunk_size):
+        chunk_stop = min(chunk_start + chunk_size, stop)
+        numbers = np.arange(chunk_start, chunk_stop, dtype=dtype)
+        yield digitalroots(numbers, base)
+
+def count_residue(stop, residue, modulus):
+    # how many of 0 <= n < stop have n % modulus == residue
+    if stop <= residue:
+        return 0
+    return (stop - residue + modulus - 1) // modulus
+
+def root_histogram(start, stop, base=10):
+    # counts of each digital root over [start, stop), index 0 .. base-1.
+    # n > 0 has root r exactly when n % (base-1) == r % (base-1), so every
+    # count is a difference of two floor divisions, whatever the range size.
+    check_base(base)
+    if start < 0:
+        raise ValueError("Digital roots are only defined for non-negative numbers")
+    counts = [0] * base
+    if stop <= start:
+        return counts
+    if start == 0:
+        counts[0] = 1
+        start = 1
+    modulus = base - 1
+    for root in range(1, base):
+        residue = root % modulus
+        counts[root] = count_residue(stop, residue, modulus) - count_residue(start, residue, modulus)
+    return counts
+
+def enumerate_histogram(start, stop, base=10, chunk_size=CHUNK_SIZE):
+    # the same histogram by computing every root, to check root_histogram against
+    check_base(base)
+    counts = np.zeros(base, dtype=np.int64)
+    for roots in iter_roots(start, stop, base, chunk_size):
+        counts += np.bincount(roots.astype(np.intp), minlength=base)
+    return counts.tolist()
 
-roots = 10*[0]
+def benchmark(base, enumerate_limit):
+    for exponent in range(3, 13):
+        stop = 10 ** exponent
+        start_time = time.perf_counter()
+        counts = root_histogram(0, stop, base)
+        analytic = time.perf_counter() - start_time
+        line = f"[0, 1e{exponent:<2d}) analytic {analytic * 1e6:8.1f}us"
+        if stop <= enumerate_limit:
+            start_time = time.perf_counter()
+            enumerated = enumerate_histogram(0, stop, base)
+            elapsed = time.perf_counter() - start_time
+            assert enumerated == counts
+            line += f"  enumerated {elapsed:8.3f}s ({stop / elapsed / 1e6:.0f}M roots/s)"
+        print(line)
 
-for i in range(1000):
-    root = digitalroot(i)
-    print(f"DR of {i} is {root}")
-    roots[root] += 1
+def base_argument(value):
+    base = int(value)
+    if base < 2:
+        raise argparse.ArgumentTypeError(f"base must be at least 2, got {base}")
+    return base
 
-print(roots)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Digital root histogram over a range of numbers")
+    parser.add_argument("--start", type=int, default=0, help="First number")
+    parser.add_argument("--stop", type=int, default=1000, help="End of the range (exclusive)")
+    parser.add_argument("--base", type=base_argument, default=10, help="Number base")
+    parser.add_argument("--verbose", action="store_true", help="Print the root of every number")
+    parser.add_argument("--benchmark", action="store_true", help="Time the analytic histogram against enumeration up to 10^12")
+    parser.add_argument("--enumerate_limit", type=float, default=1e9, help="Largest range the benchmark enumerates")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.base, args.enumerate_limit)
+    else:
+        if args.verbose:
+            for i in range(args.start, args.stop):
+                print(f"DR of {i} is {digitalroot(i, args.base)}")
+        print(root_histogram(args.start, args.stop, args.base))
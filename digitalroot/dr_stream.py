@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# digital roots and persistence of numbers too big to hold as ints
+#
+# a decimal digit file is only ever looked at as bytes: it's memory mapped,
+# split into one range per worker, and every worker counts how often each
+# digit occurs in large blocks. the per-digit counts of the ranges just add
+# up, and everything below is computed from those ten counts. bytes that
+# aren't digits (a decimal point, newlines) are skipped.
+
+import os
+import sys
+import math
+import time
+import argparse
+import multiprocessing
+import numpy as np
+from dr import digitalroot
+
+BLOCK_SIZE = 8 << 20
+# multiplicative persistence needs the product of all digits as an int,
+# only attempted while it stays below this many decimal digits
+MAX_PRODUCT_DIGITS = 200000
+
+ZERO = ord('0')
+
+def count_digits(data):
+    # ten digit counts of a uint8 array of ascii bytes. ten compare and count
+    # passes beat np.bincount, which widens every byte to intp first
+    return np.array([np.count_nonzero(data == ZERO + digit) for digit in range(10)], dtype=np.int64)
+
+def count_range(path, start, stop, block_size=BLOCK_SIZE):
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    counts = np.zeros(10, dtype=np.int64)
+    for block_start in range(start, stop, block_size):
+        counts += count_digits(data[block_start:min(block_start + block_size, stop)])
+    del data
+    return counts
+
+def count_file(path, workers=None, block_size=BLOCK_SIZE):
+    size = os.path.getsize(path)
+    if size == 0:
+        return [0] * 10
+    workers = workers or multiprocessing.cpu_count()
+    # a few ranges per worker so an uneven split doesn't leave workers idle
+    parts = max(1, min(workers * 4, size // block_size))
+    bounds = [size * i // parts for i in range(parts + 1)]
+    ranges = [(path, bounds[i], bounds[i + 1], block_size) for i in range(parts)]
+    if workers == 1 or parts == 1:
+        partials = [count_range(*r) for r in ranges]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            partials = pool.starmap(count_range, ranges)
+    return [int(c) for c in np.sum(partials, axis=0)]
+
+def count_int(number):
+    # the same counts for an int already in memory
+    return [int(c) for c in count_digits(np.frombuffer(int_digits(number), dtype=np.uint8))]
+
+def int_digits(number):
+    # python refuses to convert ints above a few thousand digits to str by default
+    limit = sys.get_int_max_str_digits() if hasattr(sys, 'get_int_max_str_digits') else None
+    if limit is not None:
+        sys.set_int_max_str_digits(0)
+    try:
+        return str(number).encode()
+    finally:
+        if limit is not None:
+            sys.set_int_max_str_digits(limit)
+
+def digit_sum(counts):
+    return sum(digit * count for digit, count in enumerate(counts))
+
+def additive_persistence_int(number):
+    steps = 0
+    while number >= 10:
+        number = sum(int(d) for d in str(number))
+        steps += 1
+    return steps
+
+def multiplicative_root_int(number):
+    # (multiplicative digital root, multiplicative persistence)
+    steps = 0
+    while number >= 10:
+        number = math.prod(int(d) for d in int_digits(number).decode())
+        steps += 1
+    return number, steps
+
+def single_digit(counts):
+    # the value of a one digit number, None for longer ones
+    if sum(counts) != 1:
+        return None
+    return counts.index(1)
+
+def additive_persistence(counts):
+    if sum(counts) <= 1:
+        return 0
+    return 1 + additive_persistence_int(digit_sum(counts))
+
+def multiplicative_root(counts):
+    # (root, persistence), or None when there are no digits or the digit
+    # product is too big to work out
+    if sum(counts) == 0:
+        return None
+    value = single_digit(counts)
+    if value is not None:
+        return value, 0
+    if counts[0]:
+        return 0, 1
+    product_digits = sum(count * math.log10(digit) for digit, count in enumerate(counts) if digit > 1)
+    if product_digits > MAX_PRODUCT_DIGITS:
+        if counts[5] and any(counts[digit] for digit in (2, 4, 6, 8)):
+            # the product ends in 0, so the next product is 0
+            return 0, 2
+        return None
+    product = math.prod(digit ** count for digit, count in enumerate(counts) if digit > 1)
+    root, steps = multiplicative_root_int(product)
+    return root, steps + 1
+
+def report(counts):
+    if sum(counts) == 0:
+        print("No digits found")
+        return
+    total = digit_sum(counts)
+    print(f"Digits: {sum(counts)}")
+    print(f"Digit counts: {counts}")
+    print(f"Digit sum: {total}")
+    print(f"Digital root: {digitalroot(total)}")
+    print(f"Additive persistence: {additive_persistence(counts)}")
+    multiplicative = multiplicative_root(counts)
+    if multiplicative is None:
+        print("Multiplicative root: digit product too large")
+    else:
+        print(f"Multiplicative root: {multiplicative[0]} (persistence {multiplicative[1]})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Digital root and persistence of a decimal digit file")
+    parser.add_argument("path", type=str, help="File of decimal digits, other bytes are ignored")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--block_size", type=int, default=BLOCK_SIZE >> 20, help="Block size in MB")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = count_file(args.path, args.workers, args.block_size << 20)
+    elapsed = time.perf_counter() - start
+    report(counts)
+    print(f"Counted {sum(counts) / 1e6:.1f}M digits in {elapsed:.2f}s ({sum(counts) / elapsed / 1e9:.2f} GB/s)")
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# grid construction time versus cell count for hexgrid
+#
+# the ring-by-ring BFS main() used to grow the grid with (including its
+# re-insert of every new hexagon after each one) against build_grid's
+# closed-form grid_coordinates. the BFS is only run up to --bfs_limit, it
+# gets slow quickly.
+
+import time
+import argparse
+from hexgrid_core import Hexagon, create_neighbor_hexagons, build_grid
+
+def build_grid_bfs(hex_width):
+    hexagons = dict({(0,0,0): Hexagon(0,0,0)})
+    new_hexagons = [hexagons[key] for key in hexagons.keys()]
+    for i in range(hex_width):
+        current_hexagons = new_hexagons
+        new_hexagons = []
+        for current_hex in current_hexagons:
+            created_hexagons = create_neighbor_hexagons(current_hex, hexagons)
+            new_hexagons += list(created_hexagons)
+            for hexagon in new_hexagons:
+                hexagons[(hexagon.array, hexagon.row, hexagon.column)] = hexagon
+    return hexagons
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark hexgrid grid construction")
+    parser.add_argument("--widths", type=int, nargs="+", default=[25, 50, 100, 200, 400, 800], help="Grid widths (rings around the center)")
+    parser.add_argument("--bfs_limit", type=int, default=100, help="Largest width to run the old BFS at")
+    args = parser.parse_args()
+
+    for width in args.widths:
+        hexagons, elapsed = timed(build_grid, width)
+        n = len(hexagons)
+        line = f"{width:4d} {n:8d} hexagons  closed form {elapsed:7.3f}s {elapsed / n * 1e6:6.2f}us/cell"
+        if width <= args.bfs_limit:
+            bfs, bfs_elapsed = timed(build_grid_bfs, width)
+            assert sorted(bfs) == list(hexagons)
+            line += f"  bfs {bfs_elapsed:8.3f}s {bfs_elapsed / n * 1e6:8.2f}us/cell"
+        print(line)
+        del hexagons
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# draw time versus grid size for hexgrid
+#
+# times the old per-hexagon vertex math against HexGeometry (first call for
+# a canvas size, then the cached call). when a display is available it also
+# times creating the polygons and moving them all on a resize.
+
+import math
+import time
+import argparse
+import tkinter as tk
+from hexgrid_core import build_grid
+from hex_geometry import HexGeometry
+
+def per_hexagon_points(hexagon, hex_width, canvas_width, canvas_height):
+    # the vertex math draw_regular_hexagon used to do for every hexagon
+    r = 0.95 * (min(canvas_width, canvas_height) / ((2*hex_width + 1) * math.sqrt(3)))
+    x, y = hexagon.convert_from_arc()
+    x = x * r * math.sqrt(3.0) + canvas_width / 2
+    y = y * r * math.sqrt(3.0) + canvas_height / 2
+    points = []
+    for i in range(6):
+        points.extend([x + r * math.cos(math.radians(30 + 60 * i)), y + r * math.sin(math.radians(30 + 60 * i))])
+    return points
+
+def timed(func, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench(width, repeats, canvas):
+    hexagons = build_grid(width)
+    keys = sorted(hexagons)
+    size = (1000, 1000)
+    old = timed(lambda: [per_hexagon_points(hexagons[key], width, *size) for key in keys], repeats)
+    geometry = HexGeometry(keys, width)
+
+    def cold():
+        geometry.size = None
+        geometry.polygon_lists(*size)
+    new = timed(cold, repeats)
+    cached = timed(lambda: geometry.polygon_lists(*size), repeats)
+    line = f"{width:4d} {len(keys):7d} hexagons  per-hexagon {old * 1000:8.2f}ms  vectorized {new * 1000:7.2f}ms  cached {cached * 1000:6.3f}ms"
+
+    if canvas is not None:
+        polygons = geometry.polygon_lists(*size)
+        start = time.perf_counter()
+        items = [canvas.create_polygon(points, outline="#AAAAAA", fill="#ffffff", width=3) for points in polygons]
+        canvas.update()
+        create = time.perf_counter() - start
+        resized = geometry.polygon_lists(800, 800)
+        start = time.perf_counter()
+        for item, points in zip(items, resized):
+            canvas.coords(item, points)
+        canvas.update()
+        resize = time.perf_counter() - start
+        canvas.delete("all")
+        line += f"  create {create * 1000:8.1f}ms  resize {resize * 1000:7.1f}ms"
+    print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark hexgrid geometry and drawing")
+    parser.add_argument("--widths", type=int, nargs="+", default=[7, 25, 50, 100], help="Grid widths (rings around the center) to time")
+    parser.add_argument("--repeats", type=int, default=5, help="Best of this many runs")
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+        canvas = tk.Canvas(root, width=1000, height=1000)
+        canvas.pack()
+        root.update()
+    except tk.TclError:
+        print("No display, only timing the geometry")
+        canvas = None
+    for width in args.widths:
+        bench(width, args.repeats, canvas)
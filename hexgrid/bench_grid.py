@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# memory and time per cell for the hexgrid cell storage
+#
+# compares the old Hexagon (a __dict__ per instance and a '#rrggbb' color
+# string) with the __slots__ Hexagon and its packed int color, at a few grid
+# sizes. the key sort every redraw, reset and reflow used to do is timed
+# next to walking the canonical dict order that replaced it.
+
+import time
+import argparse
+import tracemalloc
+from hexgrid_core import Hexagon, grid_coordinates
+
+class DictHexagon:
+    # the cell as it was before __slots__
+    def __init__(self, array, row, column, color=None, isLocked=False):
+        self.array = int(array)
+        self.row = int(row)
+        self.column = int(column)
+        self.isLocked = isLocked
+        self.isInitialized = False
+        self.color = color or '#ffffff'
+
+def measure(cls, keys):
+    tracemalloc.start()
+    start = time.perf_counter()
+    # distinct colors, like a grid after a reflow
+    hexmap = {key: cls(*key, color='#%06x' % (i * 2654435761 & 0xffffff)) for i, key in enumerate(keys)}
+    elapsed = time.perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return hexmap, size, elapsed
+
+def timed(func, repeats=3):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark hexgrid cell storage")
+    parser.add_argument("--widths", type=int, nargs="+", default=[50, 200, 500], help="Grid widths (rings around the center)")
+    args = parser.parse_args()
+
+    for width in args.widths:
+        keys = list(grid_coordinates(width))
+        n = len(keys)
+        print(f"hex_width {width}: {n} hexagons")
+        for name, cls in (("dict + str", DictHexagon), ("slots + int", Hexagon)):
+            hexmap, size, elapsed = measure(cls, keys)
+            print(f"  {name:12s} {size / n:6.1f} bytes/cell  {size / 1e6:7.1f}MB  built in {elapsed:.2f}s ({elapsed / n * 1e6:.2f}us/cell)")
+            del hexmap
+        hexmap = {key: Hexagon(*key) for key in keys}
+        sort = timed(lambda: sorted(hexmap.keys()))
+        walk = timed(lambda: list(hexmap))
+        print(f"  per pass over the grid: sorting the keys {sort * 1000:.1f}ms, canonical dict order {walk * 1000:.1f}ms")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# reflow step time per blend mode
+#
+# per-hexagon get_neighbor_blend (the reference, small grids only), the
+# engine encoding every cell each step, and the engine with its cached
+# per-cell encoded colors, where only changed cells are encoded again.
+
+import time
+import random
+import argparse
+from hexgrid_core import BLEND_MODES, build_grid, get_neighbor_blend
+from reflow_engine import ReflowEngine
+
+def seed(hexagons, count, rng):
+    for key in rng.sample(list(hexagons), count):
+        hexagon = hexagons[key]
+        hexagon.color = f'#{rng.randrange(2**24):06x}'
+        hexagon.isLocked = True
+        hexagon.isInitialized = True
+
+def warm_engine(hexagons, mode):
+    # propagate until every cell is initialized so every step does full work
+    engine = ReflowEngine(hexagons)
+    while engine.step(mode)[1]:
+        pass
+    return engine
+
+def time_engine(hexagons, mode, steps, cached):
+    engine = warm_engine(hexagons, mode)
+    start = time.perf_counter()
+    for _ in range(steps):
+        if not cached:
+            engine.values_mode = None
+        engine.step(mode)
+    return (time.perf_counter() - start) / steps
+
+def time_reference(hexagons, mode, steps):
+    engine = warm_engine(hexagons, mode)
+    engine.write_back(hexagons)
+    start = time.perf_counter()
+    for _ in range(steps):
+        for key, hexagon in hexagons.items():
+            if not hexagon.isLocked:
+                get_neighbor_blend(hexagons, hexagon.get_initialized_neighbors(hexagons), key, mode)
+    return (time.perf_counter() - start) / steps
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark hexgrid reflow steps per blend mode")
+    parser.add_argument("--hex_width", type=int, default=100, help="Grid width (rings around the center)")
+    parser.add_argument("--steps", type=int, default=20, help="Steps to average over")
+    parser.add_argument("--reference_width", type=int, default=25, help="Grid width for the per-hexagon reference")
+    args = parser.parse_args()
+
+    hexagons = build_grid(args.hex_width)
+    seed(hexagons, 12, random.Random(1))
+    small = build_grid(args.reference_width)
+    seed(small, 12, random.Random(1))
+    print(f"engine on {len(hexagons)} hexagons, reference on {len(small)} hexagons, ms per step")
+    for mode in BLEND_MODES:
+        reference = time_reference(small, mode, 2)
+        uncached = time_engine(hexagons, mode, args.steps, cached=False)
+        cached = time_engine(hexagons, mode, args.steps, cached=True)
+        print(f"{mode:12s} per-hexagon {reference * 1000:8.1f}  engine {uncached * 1000:7.2f}  cached {cached * 1000:7.2f}")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# color blending for hexgrid, on (N, 3) arrays of cells at once
+#
+# every mode is an encode into the space colors are averaged in and a decode
+# of the averaged sums back to 8 bit rgb. the per-channel conversions from
+# 8 bit values go through 256 entry lookup tables. "rgb", "hsl" and
+# "sRGB (2.2)" reproduce hexgrid_core.get_neighbor_blend exactly, rounding
+# included; "linear sRGB" averages in linear light with the real sRGB
+# transfer function and "OKLab" averages in the OKLab perceptual space.
+
+import numpy as np
+
+def hex_to_rgb(hexstring):
+    assert hexstring[0] == '#'
+    assert len(hexstring) == 7
+    rgb = tuple(int(hexstring[1+i:1+i+2], 16) for i in (0, 2, 4))
+    return rgb
+
+def rgb_to_hex(rgb):
+    return '#%02x%02x%02x' % rgb
+
+ONE_THIRD = 1.0/3.0
+ONE_SIXTH = 1.0/6.0
+TWO_THIRD = 2.0/3.0
+
+def rgb_to_hls(rgb):
+    # colorsys.rgb_to_hls over an (N, 3) array of 0..1 floats
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    maxc = np.maximum(np.maximum(r, g), b)
+    minc = np.minimum(np.minimum(r, g), b)
+    sumc = maxc + minc
+    rangec = maxc - minc
+    l = sumc / 2.0
+    grey = minc == maxc
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = np.where(l <= 0.5, rangec / sumc, rangec / (2.0 - maxc - minc))
+        rc = (maxc - r) / rangec
+        gc = (maxc - g) / rangec
+        bc = (maxc - b) / rangec
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = (h / 6.0) % 1.0
+    h[grey] = 0.0
+    s[grey] = 0.0
+    return np.stack([h, l, s], axis=1)
+
+def _v(m1, m2, hue):
+    hue = hue % 1.0
+    return np.where(hue < ONE_SIXTH, m1 + (m2 - m1) * hue * 6.0,
+           np.where(hue < 0.5, m2,
+           np.where(hue < TWO_THIRD, m1 + (m2 - m1) * (TWO_THIRD - hue) * 6.0, m1)))
+
+def hls_to_rgb(hls):
+    # colorsys.hls_to_rgb over an (N, 3) array
+    h, l, s = hls[:, 0], hls[:, 1], hls[:, 2]
+    m2 = np.where(l <= 0.5, l * (1.0 + s), l + s - (l * s))
+    m1 = 2.0 * l - m2
+    rgb = np.stack([_v(m1, m2, h + ONE_THIRD), _v(m1, m2, h), _v(m1, m2, h - ONE_THIRD)], axis=1)
+    grey = s == 0.0
+    rgb[grey] = l[grey, None]
+    return rgb
+
+# pow(x, 2.2) for every 8 bit value, computed with python's pow so the sums
+# match the per-hexagon code bit for bit
+SRGB_POW_LUT = np.array([pow(i * 1.0, 2.2) for i in range(256)])
+
+def srgb_to_linear(c):
+    # c in 0..1
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+def linear_to_srgb(c):
+    c = np.clip(c, 0.0, 1.0)
+    return np.where(c <= 0.0031308, c * 12.92, 1.055 * c ** (1 / 2.4) - 0.055)
+
+UNIT_LUT = np.arange(256) / 255.0
+LINEAR_LUT = srgb_to_linear(UNIT_LUT)
+
+# linear sRGB -> LMS and LMS' -> Lab, from the OKLab definition
+OKLAB_M1 = np.array([[0.4122214708, 0.5363325363, 0.0514459929],
+                     [0.2119034982, 0.6806995451, 0.1073969566],
+                     [0.0883024619, 0.2817188376, 0.6299787005]])
+OKLAB_M2 = np.array([[0.2104542553, 0.7936177850, -0.0040720468],
+                     [1.9779984951, -2.4285922050, 0.4505937099],
+                     [0.0259040371, 0.7827717662, -0.8086757660]])
+OKLAB_M1_INV = np.linalg.inv(OKLAB_M1)
+OKLAB_M2_INV = np.linalg.inv(OKLAB_M2)
+
+def linear_to_oklab(linear):
+    return np.cbrt(linear @ OKLAB_M1.T) @ OKLAB_M2.T
+
+def oklab_to_linear(lab):
+    return ((lab @ OKLAB_M2_INV.T) ** 3) @ OKLAB_M1_INV.T
+
+def to_8bit(unit):
+    return np.clip(np.round(unit * 255), 0, 255)
+
+# a box around every encoded 8 bit color. averages stay inside it, but an
+# over-relaxed solver can step out of it, and e.g. a negative value has no
+# 1/2.2 power
+ENCODED_RANGES = {
+    "rgb": (0.0, 255.0),
+    "hsl": (0.0, 1.0),
+    "sRGB (2.2)": (0.0, SRGB_POW_LUT[-1]),
+    "linear sRGB": (0.0, 1.0),
+    "OKLab": (np.array([0.0, -0.5, -0.5]), np.array([1.0, 0.5, 0.5])),
+}
+
+def clamp(mode, values):
+    low, high = ENCODED_RANGES[mode]
+    return np.clip(values, low, high)
+
+def encode(mode, rgb):
+    # rgb (N, 3) integer valued -> the space the mode averages in
+    index = rgb.astype(np.intp)
+    if mode == "rgb":
+        return rgb.astype(np.float64)
+    elif mode == "hsl":
+        return rgb_to_hls(UNIT_LUT[index])
+    elif mode == "sRGB (2.2)":
+        return SRGB_POW_LUT[index]
+    elif mode == "linear sRGB":
+        return LINEAR_LUT[index]
+    elif mode == "OKLab":
+        return linear_to_oklab(LINEAR_LUT[index])
+    raise ValueError(f"Unknown blend mode {mode}")
+
+def decode(mode, totals, counts):
+    # summed neighbor values -> integer rgb, rounded the way get_neighbor_blend does
+    if mode == "rgb":
+        # integer floor division in the original
+        return totals // counts[:, None]
+    elif mode == "hsl":
+        return np.round(hls_to_rgb(totals / counts[:, None]) * 255)
+    elif mode == "sRGB (2.2)":
+        return np.round(np.power(totals / counts[:, None], 1.0/2.2))
+    elif mode == "linear sRGB":
+        return to_8bit(linear_to_srgb(totals / counts[:, None]))
+    elif mode == "OKLab":
+        # averages of in-gamut colors can land just outside it, clipped back
+        return to_8bit(linear_to_srgb(oklab_to_linear(totals / counts[:, None])))
+    raise ValueError(f"Unknown blend mode {mode}")
+
+def blend(mode, colors):
+    # one cell: (k, 3) neighbor colors -> their blend as an (r, g, b) tuple of ints
+    colors = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+    totals = encode(mode, colors).sum(axis=0, keepdims=True)
+    return tuple(int(c) for c in decode(mode, totals, np.array([len(colors)], dtype=np.float64))[0])
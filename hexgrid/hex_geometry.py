@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# cached screen geometry for hexgrid
+#
+# every hexagon is the same unit hexagon, scaled by the radius and moved to
+# its center. the six vertex offsets and the grid-space centers are computed
+# once, and the screen polygons for a canvas size come out of one array
+# transform. the polygons are kept until the canvas size changes.
+
+import math
+import numpy as np
+
+# pointy-top vertices, 30 + 60*i degrees
+UNIT_OFFSETS = np.array([(math.cos(math.radians(30 + 60 * i)), math.sin(math.radians(30 + 60 * i))) for i in range(6)])
+
+def grid_center(array, row, column):
+    # same as Hexagon.convert_from_arc, in units of one center-to-center step
+    x = (array / 2.0) + column
+    y = math.sqrt(3.0) * ((array / 2.0) + row)
+    return x, y
+
+class HexGeometry:
+    def __init__(self, keys, hex_width):
+        self.keys = list(keys)
+        self.hex_width = hex_width
+        self.centers = np.array([grid_center(*key) for key in self.keys], dtype=np.float64).reshape(-1, 2)
+        self.size = None
+        self.points = None
+        self.lists = None
+
+    def radius(self, width, height):
+        # the grid is 2*hex_width + 1 hexagons across, with a 5% margin
+        return 0.95 * (min(width, height) / ((2*self.hex_width + 1) * math.sqrt(3)))
+
+    def polygons(self, width, height):
+        # (N, 12) array of x0, y0, ... x5, y5 per hexagon for this canvas size
+        if self.size != (width, height):
+            r = self.radius(width, height)
+            middle = np.array([width / 2, height / 2])
+            screen_centers = self.centers * (r * math.sqrt(3.0)) + middle
+            points = screen_centers[:, None, :] + r * UNIT_OFFSETS[None, :, :]
+            self.points = points.reshape(len(self.keys), 12)
+            self.lists = None
+            self.size = (width, height)
+        return self.points
+
+    def polygon_lists(self, width, height):
+        # plain lists, which is what tkinter wants to be handed
+        points = self.polygons(width, height)
+        if self.lists is None:
+            self.lists = points.tolist()
+        return self.lists
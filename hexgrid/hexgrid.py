@@ -1,146 +1,94 @@
 #!/usr/bin/env python3
 import tkinter as tk
 from tkinter.colorchooser import askcolor
-import math
 import functools
-import random
-import colorsys
+import time
+from reflow_engine import ReflowEngine
+from blending import hex_to_rgb
+from hex_geometry import HexGeometry
+from hexgrid_core import BLEND_MODES, SOLVER_METHODS, build_grid
+import hexgrid_core
 
 hex_width = 7
-
-@functools.total_ordering
-class Hexagon:
-    def __init__(self, array, row, column, color=None, isLocked=False):
-        self.array = int(array)
-        self.row = int(row)
-        self.column = int(column)
-        self.isLocked = isLocked
-        self.isInitialized = False
-        if not color:
-            # randomcolor = f'#{random.randrange(0, 2**24):06x}'
-            # self.color = randomcolor
-            self.color = '#ffffff'
-        else:
-            self.color = color
-        # print(f"Initing Hexagon at {(self.array, self.row, self.column)}.")
-
-    def lock(self):
-        self.isLocked = True
-
-    def unlock(self):
-        self.isLocked = False
-
-    def set_color(self, color):
-        self.color = color
-
-    def convert_from_arc(self):
-        array = float(self.array)
-        row = float(self.row)
-        column = float(self.column)
-        
-        x = (array / 2.0) + column
-        y = (math.sqrt(3.0) * ((array / 2.0) + row))
-
-        # print(f"Input: array={array}, row={row}, column={column}")
-        # print(f"Output: x={x}, y={y}")
-        return x, y
-
-    def get_neighbor_coords(self):
-        a = self.array
-        r = self.row
-        c = self.column
-        neighbors = [
-            (1-a, r-(1-a), c-(1-a)),
-            (1-a, r-(1-a), c+a),
-            (a, r, c-1),
-            (a, r, c+1),
-            (1-a, r+a, c-(1-a)),
-            (1-a, r+a, c+a)
-        ]
-        return neighbors
-
-    def get_valid_neighbors(self, hexmap):
-        valid_neighbors = []
-        for neighbor in self.get_neighbor_coords():
-            if neighbor in hexmap.keys():
-                valid_neighbors.append(neighbor)
-        return valid_neighbors
-
-    def get_initialized_neighbors(self, hexmap):
-        initialized_neighbors = []
-        for neighbor in self.get_neighbor_coords():
-            if neighbor in hexmap.keys() and hexmap[neighbor].isInitialized:
-                initialized_neighbors.append(neighbor)
-        return initialized_neighbors
-
-    def __eq__(self, other):
-        return (self.array, self.row, self.column) == (other.array, other.row, other.column)
-
-    def __lt__(self, other):
-        return (self.array, self.row, self.column) < (other.array, other.row, other.column)
-
-    def __str__(self):
-        return f"Hexagon({self.array}, {self.row}, {self.column}, color={self.color}, isLocked={self.isLocked}, isInitialized={self.isInitialized})"
-    
-    def __repr__(self):
-        return f"Hexagon({self.array}, {self.row}, {self.column}, color={self.color}, isLocked={self.isLocked}, isInitialized={self.isInitialized})"
-
-def draw_regular_hexagon(canvas, hexagon):
-    canvas_width = canvas.winfo_width()
-    canvas_height = canvas.winfo_height()
-    # Calculate the radius as 5% of the smallest dimension of the window
-    r = 0.95 * (min(canvas_width, canvas_height) / ((2*hex_width + 1) * math.sqrt(3)))
-    canvas_mid_x = canvas_width / 2
-    canvas_mid_y = canvas_height / 2
-
-    x, y = hexagon.convert_from_arc()
-    x *= r * math.sqrt(3.0)
-    y *= r * math.sqrt(3.0)
-    x += canvas_mid_x
-    y += canvas_mid_y
-    angle = 360 / 6
-    points = []
-
-    for i in range(6):
-        x_i = x + r * math.cos(math.radians(30 + angle * i))
-        y_i = y + r * math.sin(math.radians(30 + angle * i))
-        points.extend([x_i, y_i])
-
-    # print(f"Hexagon {(hexagon.array, hexagon.row, hexagon.column)} - Cartesian Coordinates: {x}, {y}")
+# canvas item id -> hexagon coordinates, and back
+hex_canvas_objects = {}
+hex_canvas_items = {}
+# coordinates -> (packed rgb, isLocked) as last drawn
+drawn_state = {}
+# screen polygons for the current canvas size
+geometry = None
+# reflow limits, the residual is the largest change of a color channel in the last iteration
+max_iterations = 100000
+tolerance = 0
+time_budget = 30
+# how often the canvas is refreshed while a reflow runs
+animation_fps = 30
+reflow_running = False
+
+def hexagon_outline(hexagon):
     if hexagon.isLocked:
         # outline = "#000000"
-        outline = hexagon.color
-    else:
-        outline = "#AAAAAA"
-    object_id = canvas.create_polygon(points, outline=outline, fill=hexagon.color, width=3)
+        return hexagon.color
+    return "#AAAAAA"
+
+def draw_regular_hexagon(canvas, hexagon, points):
+    tags = ("hexagon", "locked") if hexagon.isLocked else ("hexagon",)
+    object_id = canvas.create_polygon(points, outline=hexagon_outline(hexagon), fill=hexagon.color, width=3, tags=tags)
     return object_id
 
 def resize_window(event=None):
-    print(f"Window size is now {canvas.winfo_width()}x{canvas.winfo_height()}")
-    redraw_hexagons()
-
-def redraw_hexagons(event=None):
-    canvas.delete("all")
-    hex_canvas_objects = {}
-
-    hexagon_key_list = list(hexagons.keys())
-    hexagon_key_list.sort()
-
-    print(f"Redrawing {len(hexagon_key_list)} hexagons...")
-    tooltips = {}
-    locked_list = []
-    for key in hexagon_key_list:
-        object_id = draw_regular_hexagon(canvas, hexagons[key])
-        if hexagons[key].isLocked:
-            locked_list.append(object_id)
+    width, height = canvas.winfo_width(), canvas.winfo_height()
+    if geometry.size == (width, height):
+        return
+    print(f"Window size is now {width}x{height}")
+    # the polygons are only moved, their colors can't have changed
+    for key, points in zip(geometry.keys, geometry.polygon_lists(width, height)):
+        canvas.coords(hex_canvas_items[key], points)
+
+def draw_hexagons():
+    global geometry
+    # creates one polygon per hexagon, only done once. all later changes go
+    # through redraw_hexagons and resize_window.
+    hexagon_key_list = list(hexagons)
+    geometry = HexGeometry(hexagon_key_list, hex_width)
+    polygons = geometry.polygon_lists(canvas.winfo_width(), canvas.winfo_height())
+
+    print(f"Drawing {len(hexagon_key_list)} hexagons...")
+    for key, points in zip(hexagon_key_list, polygons):
+        hexagon = hexagons[key]
+        object_id = draw_regular_hexagon(canvas, hexagon, points)
         # print(f"Drew hexagon {key}, got id {object_id}")
         hex_canvas_objects[object_id] = key
-        canvas.tag_bind(object_id, '<Enter>', functools.partial(item_hovered, id_mapping=hex_canvas_objects))
-        canvas.tag_bind(object_id, '<Button-3>', functools.partial(hex_toggle_lock, id_mapping=hex_canvas_objects))
-        canvas.tag_bind(object_id, '<Button-1>', functools.partial(hex_choose_color, id_mapping=hex_canvas_objects))
+        hex_canvas_items[key] = object_id
+        drawn_state[key] = (hexagon.rgb, hexagon.isLocked)
+    canvas.tag_raise("locked")
 
-    for elem in locked_list:
-        canvas.tag_raise(elem)
+    # bound once on the tag instead of three bindings per polygon
+    canvas.tag_bind("hexagon", '<Enter>', functools.partial(item_hovered, id_mapping=hex_canvas_objects))
+    canvas.tag_bind("hexagon", '<Button-3>', functools.partial(hex_toggle_lock, id_mapping=hex_canvas_objects))
+    canvas.tag_bind("hexagon", '<Button-1>', functools.partial(hex_choose_color, id_mapping=hex_canvas_objects))
+
+def redraw_hexagons(event=None):
+    # only touch the polygons whose color or lock state changed since they were last drawn
+    updated = 0
+    lock_changed = False
+    for key, object_id in hex_canvas_items.items():
+        hexagon = hexagons[key]
+        state = (hexagon.rgb, hexagon.isLocked)
+        if drawn_state[key] == state:
+            continue
+        canvas.itemconfigure(object_id, fill=hexagon.color, outline=hexagon_outline(hexagon))
+        if drawn_state[key][1] != hexagon.isLocked:
+            if hexagon.isLocked:
+                canvas.addtag_withtag("locked", object_id)
+            else:
+                canvas.dtag(object_id, "locked")
+            lock_changed = True
+        drawn_state[key] = state
+        updated += 1
+    if lock_changed:
+        canvas.tag_raise("locked")
+    return updated
 
 
 def item_hovered(event, id_mapping):
@@ -150,7 +98,16 @@ def item_hovered(event, id_mapping):
     #print(f"Hovered over {canvas_item_id} - coords are {coordinates} - color: {hexagon.color}")
     canvas.winfo_toplevel().title(f"Hexagons - {coordinates} - color: {hex_to_rgb(hexagon.color)}")
 
+def edit_blocked():
+    # the running reflow works on a copy of the grid and writes it back every
+    # frame, so edits made in the meantime would be lost or ignored
+    if reflow_running:
+        print("Reflow running, wait for it to finish")
+    return reflow_running
+
 def hex_toggle_lock(event, id_mapping):
+    if edit_blocked():
+        return
     canvas_item_id = event.widget.find_withtag('current')[0]
     coordinates = id_mapping[canvas_item_id]
     hexagon = hexagons[coordinates]
@@ -161,6 +118,8 @@ def hex_toggle_lock(event, id_mapping):
     redraw_hexagons()
 
 def hex_choose_color(event, id_mapping):
+    if edit_blocked():
+        return
     canvas_item_id = event.widget.find_withtag('current')[0]
     coordinates = id_mapping[canvas_item_id]
     print(f"Left clicked {canvas_item_id} - coords are {coordinates}")
@@ -185,18 +144,9 @@ def reset_unlocked():
     reset_hexagons('unlocked')
 
 def reset_hexagons(which):
-    hex_key_list = list(hexagons.keys())
-    # sort first so we get a deterministic order for hexagons
-    hex_key_list.sort()
-    reset_count = 0
-    for key in hex_key_list:
-        if which == 'unlocked':
-            if hexagons[key].isLocked:
-                continue
-        hexagons[key].isInitialized = False
-        hexagons[key].isLocked = False
-        hexagons[key].color = "#ffffff"
-        reset_count += 1
+    if edit_blocked():
+        return
+    reset_count = hexgrid_core.reset_hexagons(hexagons, which)
     print(f"Reset {reset_count} hexagons.")
     redraw_hexagons()
     return
@@ -210,160 +160,46 @@ def step_click_callback():
     print("Executing color reflow...")
     reflow_colors(1)
 
-def hex_to_rgb(hexstring):
-    assert hexstring[0] == '#'
-    assert len(hexstring) == 7
-    rgb = tuple(int(hexstring[1+i:1+i+2], 16) for i in (0, 2, 4))
-    return rgb
-
-def rgb_to_hex(rgb):
-    return '#%02x%02x%02x' % rgb
-
-def get_neighbor_blend(hexmap, neighbors, coordinates):
-    num_neighbors = len(neighbors)
-    mode = blend_mode.get()
-    # print(f"Hexagon {coordinates} has {num_neighbors} neighbors.")
-    # print(f"Blend mode = {mode}")
-    if mode == "rgb":
-        total_r = 0
-        total_g = 0
-        total_b = 0
-        for neighbor in neighbors:
-            r, g, b = hex_to_rgb(hexmap[neighbor].color)
-            # print(f"Neighbor {neighbor} has color {(r,g,b)}")
-            total_r += r
-            total_g += g
-            total_b += b
-            # print(f"Total colors: {(total_r, total_g, total_b)}")
-        out_r = total_r//num_neighbors
-        out_g = total_g//num_neighbors
-        out_b = total_b//num_neighbors
-        # print(f"Output colors: {(out_r, out_g, out_b)}")
-        return rgb_to_hex((out_r, out_g, out_b))
-    elif mode == "hsl":
-        total_h = 0
-        total_l = 0
-        total_s = 0
-        for neighbor in neighbors:
-            rgb = (elem/255.0 for elem in hex_to_rgb(hexmap[neighbor].color))
-            #print(rgb)
-            neighbor_hsl = colorsys.rgb_to_hls(*rgb)
-            #print(neighbor_hsl)
-            total_h += neighbor_hsl[0]
-            total_l += neighbor_hsl[1]
-            total_s += neighbor_hsl[2]
-        out_h = total_h/num_neighbors
-        out_l = total_l/num_neighbors
-        out_s = total_s/num_neighbors
-        out_rgb_norm = colorsys.hls_to_rgb(out_h, out_l, out_s)
-        out_rgb = tuple([round(elem*255) for elem in out_rgb_norm])
-        #print(out_rgb)
-        return rgb_to_hex(out_rgb)
-    elif mode == "sRGB (2.2)":
-        total_r = 0
-        total_g = 0
-        total_b = 0
-        for neighbor in neighbors:
-            r, g, b = hex_to_rgb(hexmap[neighbor].color)
-            # print(f"Neighbor {neighbor} has color {(r,g,b)}")
-            total_r += pow(r * 1.0, 2.2)
-            total_g += pow(g * 1.0, 2.2)
-            total_b += pow(b * 1.0, 2.2)
-            # print(f"Total colors: {(total_r, total_g, total_b)}")
-        srgb_r = total_r/num_neighbors
-        srgb_g = total_g/num_neighbors
-        srgb_b = total_b/num_neighbors
-        final_r = round(pow(srgb_r, 1.0/2.2))
-        final_g = round(pow(srgb_g, 1.0/2.2))
-        final_b = round(pow(srgb_b, 1.0/2.2))
-        # print(f"Output colors: {(out_r, out_g, out_b)}")
-        return rgb_to_hex((final_r, final_g, final_b))
-
-
-
-
-
-
-def reflow_colors(steps, depth=0):
-    depth += 1
-    print(f"Iteration: {depth}")
-    num_locked = len([1 for elem in hexagons.values() if elem.isLocked])
-    num_initialized = len([1 for elem in hexagons.values() if elem.isInitialized])
-    print(f"Number of locked hexagons: {num_locked} Number of initialzed hexagons: {num_initialized}")
-    # iterate through each hexagon.
-    # for each one that's not locked, check to see if there are any neighbors that are initialized.
-    # if there are, make it the blend of all of its neighbors.
-    # once we're done, apply changes and intialize the hexagons.
-    changes_to_apply = {}
-    hex_key_list = list(hexagons.keys())
-    # sort first so we get a deterministic order for hexagons
-    hex_key_list.sort()
-    for key in hex_key_list:
-        current_hex = hexagons[key]
-        if current_hex.isLocked:
-            continue
-        # assume neighbors are valid and initialized
-        neighbors = current_hex.get_initialized_neighbors(hexagons)
-        num_neighbors = len(neighbors)
-        if len(neighbors) == 0:
-            # no neighbors
-            continue
-        # print(f"Hex {key}: Found {num_neighbors} neighbors: {neighbors})")
-        blended_color = get_neighbor_blend(hexagons, neighbors, key)
-        changes_to_apply[key] = blended_color
-
-    changes_keys = list(changes_to_apply.keys())
-    changes_keys.sort()
-    newly_initialized = 0
-    total_color_changes = 0
-    for key in changes_keys:
-        if not hexagons[key].color == changes_to_apply[key]:
-            hexagons[key].set_color(changes_to_apply[key])
-            # print(f"Changing {key} to {changes_to_apply[key]}")
-            total_color_changes += 1
-        if not hexagons[key].isInitialized:
-            newly_initialized += 1
-            hexagons[key].isInitialized = True
-    print(f"{total_color_changes} hexagons updated. {newly_initialized} hexagons initialized.")
-    # need to add another case that breaks out of the infinite loop
-    if (newly_initialized == 0 and total_color_changes == 0):
-        print(f"Nothing else to reflow. Total iterations: {depth}")
-        redraw_hexagons()
-        return
-    if (num_locked == 0 or num_initialized == 0) and steps == -1:
-        print(f"Don't reflow with nothing locked or initialized...")
-        redraw_hexagons()
-        return
-    # where no hexagons changed
-    if depth == steps:
-        # base case
-        redraw_hexagons()
+def reflow_colors(steps):
+    global reflow_running
+    if reflow_running:
+        print("Reflow already running")
         return
+    # the grid is copied into arrays once per reflow and written back at the end
+    engine = ReflowEngine(hexagons)
+    num_locked = int(engine.locked.sum())
+    num_initialized = int(engine.initialized.sum())
+    print(f"Number of locked hexagons: {num_locked} Number of initialzed hexagons: {num_initialized}")
+    if steps == 1:
+        # every hexagon that's not locked and has initialized neighbors becomes the
+        # blend of those neighbors, computed for the whole grid at once.
+        total_color_changes, newly_initialized = engine.step(blend_mode.get())
+        print(f"{total_color_changes} hexagons updated. {newly_initialized} hexagons initialized.")
     else:
-        try:
-            reflow_colors(steps, depth=depth)
-        except RecursionError as e:
-            print(f"Failed to converge on colors in {depth} iterations. Aborting.")
+        last_frame = [time.perf_counter()]
+
+        def animate(iterations, residual):
+            # show the reflow in progress, and keep the window responsive
+            if time.perf_counter() - last_frame[0] < 1 / animation_fps:
+                return
+            engine.write_back(hexagons)
             redraw_hexagons()
-        return
+            canvas.winfo_toplevel().title(f"Hexagons - reflow iteration {iterations}, residual {residual:g}")
+            canvas.update()
+            last_frame[0] = time.perf_counter()
 
-def create_neighbor_hexagons(hexagon):
-    a = hexagon.array
-    r = hexagon.row
-    c = hexagon.column
-    neighbors = hexagon.get_neighbor_coords()
-    created_hexagons = []
-    for candidate in neighbors:
-        if not (candidate in hexagons.keys()):
-            # *candidate expands the candidate tuple
-            created_hexagons.append(Hexagon(*candidate))
-        else:
-            # print(f"Not generating {candidate} as this already exists.")
-            pass
-    return created_hexagons
+        reflow_running = True
+        try:
+            iterations, residual, reason = engine.solve(blend_mode.get(), max_iterations=max_iterations,
+                tolerance=tolerance, time_budget=time_budget, method=solver_method.get(), progress=animate)
+        finally:
+            reflow_running = False
+        print(f"Reflow stopped ({reason}) after {iterations} iterations, residual {residual:g}")
+    engine.write_back(hexagons)
+    redraw_hexagons()
 
 def main():
-    global hexagons, canvas, hex_canvas_objects, hex_width, blend_mode
+    global hexagons, canvas, hex_width, blend_mode, solver_method
     root = tk.Tk()
     root.resizable(True, True)
     root.title("Pointy-Top Hexagons")
@@ -398,36 +234,26 @@ def main():
     blend_mode = tk.StringVar(root)
     blend_mode.set("rgb")
 
-    blend_option = tk.OptionMenu(botframe, blend_mode, "rgb", "hsl", "sRGB (2.2)")
+    blend_option = tk.OptionMenu(botframe, blend_mode, *BLEND_MODES)
     blend_option.place(x=350, y=50)
+
+    # jacobi is the original step-by-step reflow, sor solves the unrounded blend in fewer
+    # sweeps and can end up visibly different from it
+    solver_method = tk.StringVar(root)
+    solver_method.set("jacobi")
+
+    solver_option = tk.OptionMenu(botframe, solver_method, *SOLVER_METHODS)
+    solver_option.place(x=350, y=100)
     # blend_option.pack()
 
     root.update()
 
-    hexagons = dict({(0,0,0): Hexagon(0,0,0)})
-    # print(hexagons)
-    new_hexagons = [hexagons[key] for key in hexagons.keys()]
-    new_hexagons.sort()
-    # print(new_hexagons)
-    for i in range(hex_width):
-        current_hexagons = new_hexagons
-        new_hexagons = []
-        for current_hex in current_hexagons:
-            # print(current_hex)
-            created_hexagons = create_neighbor_hexagons(current_hex)
-            new_hexagons += list(created_hexagons)
-            # print(f"Created {len(created_hexagons)} hexagons.")
-            # print(new_hexagons)
-            for hexagon in new_hexagons:
-                hexagons[(hexagon.array, hexagon.row, hexagon.column)] = hexagon
-            # print(f"Total hexagons: {len(hexagons)}")
-    hexagon_list = [hexagons[key] for key in hexagons.keys()]
-    hexagon_list.sort()
-    for hexagon in hexagon_list:
+    hexagons = build_grid(hex_width)
+    for hexagon in hexagons.values():
         print(hexagon)
 
+    draw_hexagons()
     canvas.bind("<Configure>", resize_window)
-    redraw_hexagons()
 
     root.mainloop()
 
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# run a hexgrid reflow without a display
+#
+# seed file (JSON), the same format the JSON output is written in, so a
+# result can be fed back in:
+#   {"hex_width": 50, "blend_mode": "rgb",
+#    "cells": [{"array": 0, "row": 0, "column": 0, "color": "#ff0000", "locked": true}, ...]}
+# cells with a color are initialized, and locked unless "locked" is false.
+# hex_width and blend_mode are optional and overridden by the command line.
+
+import json
+import time
+import argparse
+from PIL import Image, ImageDraw
+from hex_geometry import HexGeometry
+from hexgrid_core import BLEND_MODES, SOLVER_METHODS, build_grid, reflow
+
+def load_seeds(hexmap, cells):
+    seeded = 0
+    for cell in cells:
+        key = (cell["array"], cell["row"], cell["column"])
+        if key not in hexmap:
+            print(f"Seed {key} is outside the grid, skipping")
+            continue
+        hexagon = hexmap[key]
+        hexagon.color = cell["color"]
+        hexagon.isInitialized = True
+        hexagon.isLocked = cell.get("locked", True)
+        seeded += 1
+    return seeded
+
+def write_json(hexmap, hex_width, mode, path):
+    cells = [{"array": key[0], "row": key[1], "column": key[2], "color": hexmap[key].color, "locked": hexmap[key].isLocked}
+             for key in hexmap]
+    with open(path, "w") as f:
+        json.dump({"hex_width": hex_width, "blend_mode": mode, "cells": cells}, f)
+
+def write_png(hexmap, hex_width, path, size):
+    keys = list(hexmap)
+    geometry = HexGeometry(keys, hex_width)
+    image = Image.new("RGB", (size, size), "#aaaaaa")
+    draw = ImageDraw.Draw(image)
+    for key, points in zip(keys, geometry.polygon_lists(size, size)):
+        draw.polygon(points, fill=hexmap[key].color)
+    image.save(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reflow a hexgrid from seed colors and save the result")
+    parser.add_argument("seeds", type=str, help="JSON seed file")
+    parser.add_argument("output", type=str, help="Output file, .png or .json")
+    parser.add_argument("--hex_width", type=int, help="Rings of hexagons around the center (default from the seed file, or 7)")
+    parser.add_argument("--blend_mode", choices=BLEND_MODES, help="Blend mode (default from the seed file, or rgb)")
+    parser.add_argument("--method", choices=SOLVER_METHODS, default="jacobi", help="Reflow solver")
+    parser.add_argument("--max_iterations", type=int, default=100000, help="Stop after this many iterations")
+    parser.add_argument("--tolerance", type=float, default=0, help="Stop once no color channel changes by more than this")
+    parser.add_argument("--time_budget", type=float, help="Stop after this many seconds")
+    parser.add_argument("--size", type=int, default=1000, help="PNG width and height in pixels")
+    args = parser.parse_args()
+
+    with open(args.seeds) as f:
+        seeds = json.load(f)
+    hex_width = args.hex_width or seeds.get("hex_width", 7)
+    mode = args.blend_mode or seeds.get("blend_mode", "rgb")
+
+    start = time.perf_counter()
+    hexagons = build_grid(hex_width)
+    print(f"Built {len(hexagons)} hexagons in {time.perf_counter() - start:.2f}s")
+    seeded = load_seeds(hexagons, seeds.get("cells", []))
+    print(f"Seeded {seeded} hexagons")
+
+    start = time.perf_counter()
+    iterations, residual, reason = reflow(hexagons, mode, method=args.method, max_iterations=args.max_iterations,
+                                          tolerance=args.tolerance, time_budget=args.time_budget)
+    print(f"Reflow stopped ({reason}) after {iterations} iterations, residual {residual:g}, in {time.perf_counter() - start:.2f}s")
+
+    if args.output.endswith(".png"):
+        write_png(hexagons, hex_width, args.output, args.size)
+    else:
+        write_json(hexagons, hex_width, mode, args.output)
+    print(f"Wrote {args.output}")
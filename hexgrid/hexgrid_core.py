@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# headless hexgrid: the grid, blending and reflow without any Tk state.
+# hexgrid.py is the interactive front end, hexgrid_batch.py runs it from
+# the command line.
+
+import math
+import functools
+import random
+import colorsys
+from reflow_engine import ReflowEngine
+from blending import hex_to_rgb, rgb_to_hex, blend
+
+BLEND_MODES = ("rgb", "hsl", "sRGB (2.2)", "linear sRGB", "OKLab")
+SOLVER_METHODS = ("jacobi", "sor")
+
+WHITE = 0xffffff
+
+def pack_rgb(hexstring):
+    # '#rrggbb' -> 0xrrggbb
+    assert hexstring[0] == '#'
+    assert len(hexstring) == 7
+    return int(hexstring[1:], 16)
+
+def unpack_rgb(value):
+    return '#%06x' % value
+
+@functools.total_ordering
+class Hexagon:
+    # no per-instance __dict__, and the color is one packed int instead of a
+    # '#rrggbb' string. the color property still reads and writes strings.
+    __slots__ = ('array', 'row', 'column', 'rgb', 'isLocked', 'isInitialized')
+
+    def __init__(self, array, row, column, color=None, isLocked=False):
+        self.array = int(array)
+        self.row = int(row)
+        self.column = int(column)
+        self.isLocked = isLocked
+        self.isInitialized = False
+        if not color:
+            # randomcolor = f'#{random.randrange(0, 2**24):06x}'
+            # self.color = randomcolor
+            self.rgb = WHITE
+        else:
+            self.rgb = pack_rgb(color)
+        # print(f"Initing Hexagon at {(self.array, self.row, self.column)}.")
+
+    @property
+    def color(self):
+        return unpack_rgb(self.rgb)
+
+    @color.setter
+    def color(self, color):
+        self.rgb = pack_rgb(color)
+
+    def lock(self):
+        self.isLocked = True
+
+    def unlock(self):
+        self.isLocked = False
+
+    def set_color(self, color):
+        self.color = color
+
+    def convert_from_arc(self):
+        array = float(self.array)
+        row = float(self.row)
+        column = float(self.column)
+        
+        x = (array / 2.0) + column
+        y = (math.sqrt(3.0) * ((array / 2.0) + row))
+
+        # print(f"Input: array={array}, row={row}, column={column}")
+        # print(f"Output: x={x}, y={y}")
+        return x, y
+
+    def get_neighbor_coords(self):
+        a = self.array
+        r = self.row
+        c = self.column
+        neighbors = [
+            (1-a, r-(1-a), c-(1-a)),
+            (1-a, r-(1-a), c+a),
+            (a, r, c-1),
+            (a, r, c+1),
+            (1-a, r+a, c-(1-a)),
+            (1-a, r+a, c+a)
+        ]
+        return neighbors
+
+    def get_valid_neighbors(self, hexmap):
+        valid_neighbors = []
+        for neighbor in self.get_neighbor_coords():
+            if neighbor in hexmap.keys():
+                valid_neighbors.append(neighbor)
+        return valid_neighbors
+
+    def get_initialized_neighbors(self, hexmap):
+        initialized_neighbors = []
+        for neighbor in self.get_neighbor_coords():
+            if neighbor in hexmap.keys() and hexmap[neighbor].isInitialized:
+                initialized_neighbors.append(neighbor)
+        return initialized_neighbors
+
+    def __eq__(self, other):
+        return (self.array, self.row, self.column) == (other.array, other.row, other.column)
+
+    def __lt__(self, other):
+        return (self.array, self.row, self.column) < (other.array, other.row, other.column)
+
+    def __str__(self):
+        return f"Hexagon({self.array}, {self.row}, {self.column}, color={self.color}, isLocked={self.isLocked}, isInitialized={self.isInitialized})"
+    
+    def __repr__(self):
+        return f"Hexagon({self.array}, {self.row}, {self.column}, color={self.color}, isLocked={self.isLocked}, isInitialized={self.isInitialized})"
+
+def create_neighbor_hexagons(hexagon, hexmap):
+    neighbors = hexagon.get_neighbor_coords()
+    created_hexagons = []
+    for candidate in neighbors:
+        if not (candidate in hexmap.keys()):
+            # *candidate expands the candidate tuple
+            created_hexagons.append(Hexagon(*candidate))
+    return created_hexagons
+
+def grid_coordinates(hex_width):
+    # every (array, row, column) within hex_width steps of (0,0,0), in
+    # canonical sorted order. in doubled coordinates (y = 2*row + array,
+    # x = 2*column + array) a cell is within reach when
+    # |y| + max(0, (|x| - |y|) / 2) <= hex_width, so each y gets one run of
+    # columns |x| <= 2*hex_width - |y|.
+    for array in (0, 1):
+        for y in range(-hex_width, hex_width + 1):
+            if y % 2 != array:
+                continue
+            row = (y - array) // 2
+            span = 2 * hex_width - abs(y)
+            for column in range((-span - array) // 2, (span - array) // 2 + 1):
+                yield (array, row, column)
+
+def build_grid(hex_width):
+    # hex_width rings of hexagons around (0,0,0), already in canonical order
+    return {key: Hexagon(*key) for key in grid_coordinates(hex_width)}
+
+def reset_hexagons(hexmap, which):
+    reset_count = 0
+    # the grid is already in canonical order
+    for key in hexmap:
+        if which == 'unlocked':
+            if hexmap[key].isLocked:
+                continue
+        hexmap[key].isInitialized = False
+        hexmap[key].isLocked = False
+        hexmap[key].rgb = WHITE
+        reset_count += 1
+    return reset_count
+
+def get_neighbor_blend(hexmap, neighbors, coordinates, mode):
+    # the per-hexagon blend, kept as the reference ReflowEngine has to match
+    num_neighbors = len(neighbors)
+    # print(f"Hexagon {coordinates} has {num_neighbors} neighbors.")
+    # print(f"Blend mode = {mode}")
+    if mode == "rgb":
+        total_r = 0
+        total_g = 0
+        total_b = 0
+        for neighbor in neighbors:
+            r, g, b = hex_to_rgb(hexmap[neighbor].color)
+            # print(f"Neighbor {neighbor} has color {(r,g,b)}")
+            total_r += r
+            total_g += g
+            total_b += b
+            # print(f"Total colors: {(total_r, total_g, total_b)}")
+        out_r = total_r//num_neighbors
+        out_g = total_g//num_neighbors
+        out_b = total_b//num_neighbors
+        # print(f"Output colors: {(out_r, out_g, out_b)}")
+        return rgb_to_hex((out_r, out_g, out_b))
+    elif mode == "hsl":
+        total_h = 0
+        total_l = 0
+        total_s = 0
+        for neighbor in neighbors:
+            rgb = (elem/255.0 for elem in hex_to_rgb(hexmap[neighbor].color))
+            #print(rgb)
+            neighbor_hsl = colorsys.rgb_to_hls(*rgb)
+            #print(neighbor_hsl)
+            total_h += neighbor_hsl[0]
+            total_l += neighbor_hsl[1]
+            total_s += neighbor_hsl[2]
+        out_h = total_h/num_neighbors
+        out_l = total_l/num_neighbors
+        out_s = total_s/num_neighbors
+        out_rgb_norm = colorsys.hls_to_rgb(out_h, out_l, out_s)
+        out_rgb = tuple([round(elem*255) for elem in out_rgb_norm])
+        #print(out_rgb)
+        return rgb_to_hex(out_rgb)
+    elif mode == "sRGB (2.2)":
+        total_r = 0
+        total_g = 0
+        total_b = 0
+        for neighbor in neighbors:
+            r, g, b = hex_to_rgb(hexmap[neighbor].color)
+            # print(f"Neighbor {neighbor} has color {(r,g,b)}")
+            total_r += pow(r * 1.0, 2.2)
+            total_g += pow(g * 1.0, 2.2)
+            total_b += pow(b * 1.0, 2.2)
+            # print(f"Total colors: {(total_r, total_g, total_b)}")
+        srgb_r = total_r/num_neighbors
+        srgb_g = total_g/num_neighbors
+        srgb_b = total_b/num_neighbors
+        final_r = round(pow(srgb_r, 1.0/2.2))
+        final_g = round(pow(srgb_g, 1.0/2.2))
+        final_b = round(pow(srgb_b, 1.0/2.2))
+        # print(f"Output colors: {(out_r, out_g, out_b)}")
+        return rgb_to_hex((final_r, final_g, final_b))
+    else:
+        # the newer modes only exist in blending.py
+        return rgb_to_hex(blend(mode, [hex_to_rgb(hexmap[neighbor].color) for neighbor in neighbors]))
+
+def reflow(hexmap, mode, method="jacobi", max_iterations=100000, tolerance=0, time_budget=None, progress=None):
+    # run the reflow to convergence and write the colors back, returns (iterations, residual, reason)
+    engine = ReflowEngine(hexmap)
+    result = engine.solve(mode, max_iterations=max_iterations, tolerance=tolerance,
+                          time_budget=time_budget, method=method, progress=progress)
+    engine.write_back(hexmap)
+    return result
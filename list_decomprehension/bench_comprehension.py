@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Time a comprehension against its decomposed loop form.
+
+Both forms are compiled into functions that take the bound names as
+arguments, so every variable is a fast local in both. For each input size
+the bindings are evaluated with n set to that size, the two results are
+checked to be equal, and then:
+- each form is timed with timeit (best of --repeat),
+- the peak allocation of one call is taken from tracemalloc,
+- the growth exponent between neighbouring sizes gives the scaling curve.
+Generator expressions are consumed with list() in both forms.
+
+    bench_comprehension.py '[x * y for x in xs if x % 3 for y in ys]' \\
+        --bind xs='range(n)' --bind ys='[1, 2, 3]'
+"""
+import ast
+import math
+import timeit
+import argparse
+import tracemalloc
+from list_decomprehension import INDENT, parse_comprehension, decompose_node, unused_name
+
+def build_functions(comprehension, names):
+    # (comprehension function, loop function), both taking the bound names
+    node = parse_comprehension(comprehension)
+    generator = isinstance(node, ast.GeneratorExp)
+    header = f"def run({', '.join(names)}):"
+    expression = ast.unparse(node)
+    comprehension_source = '\n'.join([header, f"{INDENT}return {f'list({expression})' if generator else expression}"])
+    # the bound names are reserved so the loop's helper names can't hide them
+    result = unused_name('result', names)
+    loop_lines = [INDENT + line for line in decompose_node(node, result, reserved=names).split('\n')]
+    loop_source = '\n'.join([header] + loop_lines + [f"{INDENT}return {f'list({result})' if generator else result}"])
+
+    functions = []
+    for source in (comprehension_source, loop_source):
+        namespace = {}
+        exec(compile(source, '<bench>', 'exec'), namespace)
+        functions.append(namespace['run'])
+    return functions[0], functions[1], loop_source
+
+def time_call(function, args, repeat):
+    # seconds per call, best of repeat
+    timer = timeit.Timer(lambda: function(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def peak_allocation(function, args):
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def parse_bindings(bindings):
+    names = []
+    expressions = []
+    for binding in bindings:
+        name, _, expression = binding.partition('=')
+        if not name.isidentifier() or not expression:
+            raise ValueError(f"Bindings look like name=expression, got {binding!r}")
+        names.append(name)
+        expressions.append(expression)
+    return names, expressions
+
+def exponent(sizes, times, i):
+    # slope of log(time) over log(size) from the previous size
+    if i == 0 or sizes[i] == sizes[i - 1] or times[i - 1] <= 0:
+        return None
+    return math.log(times[i] / times[i - 1]) / math.log(sizes[i] / sizes[i - 1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a comprehension against its explicit loop form")
+    parser.add_argument("comprehension", type=str, help="Comprehension to benchmark")
+    parser.add_argument("--bind", action="append", default=[], help="name=expression for a name the comprehension uses, n is the input size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000], help="Input sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="Best of this many timeit runs")
+    parser.add_argument("--show_loop", action="store_true", help="Print the loop code being timed")
+    args = parser.parse_args()
+
+    try:
+        names, expressions = parse_bindings(args.bind)
+        comprehension_function, loop_function, loop_source = build_functions(args.comprehension, names)
+    except ValueError as e:
+        raise SystemExit(e)
+    if args.show_loop:
+        print(loop_source)
+        print()
+
+    print(f"{'n':>8s} {'comprehension':>22s} {'loop':>22s} {'loop/comp':>9s} {'comp peak':>10s} {'loop peak':>10s} {'comp ~n^k':>9s} {'loop ~n^k':>9s}")
+    comprehension_times = []
+    loop_times = []
+    for i, n in enumerate(args.sizes):
+        call_args = [eval(expression, {'n': n}) for expression in expressions]
+        if comprehension_function(*call_args) != loop_function(*call_args):
+            raise SystemExit(f"The loop form gives a different result at n={n}")
+        comprehension_times.append(time_call(comprehension_function, call_args, args.repeat))
+        loop_times.append(time_call(loop_function, call_args, args.repeat))
+        comprehension_peak = peak_allocation(comprehension_function, call_args)
+        loop_peak = peak_allocation(loop_function, call_args)
+        slopes = [exponent(args.sizes, times, i) for times in (comprehension_times, loop_times)]
+        print(f"{n:8d} "
+              f"{comprehension_times[-1] * 1e6:11.2f}us {1 / comprehension_times[-1]:8.0f}/s "
+              f"{loop_times[-1] * 1e6:11.2f}us {1 / loop_times[-1]:8.0f}/s "
+              f"{loop_times[-1] / comprehension_times[-1]:9.2f} "
+              f"{comprehension_peak / 1024:8.1f}kB {loop_peak / 1024:8.1f}kB "
+              + ' '.join(f"{slope:9.2f}" if slope is not None else f"{'':9s}" for slope in slopes))
+
+if __name__ == '__main__':
+    main()
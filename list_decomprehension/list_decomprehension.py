@@ -1,33 +1,189 @@
 #!/usr/bin/env python3
+import ast
+import argparse
 
-def decompose_list_comprehension(comprehension):
-    # First, we parse the comprehension to extract its components
-    _, iterators, conditions, _ = parse_list_comprehension(comprehension)
+INDENT = '    '
 
-    # Next, we initialize a list to hold the generated loops
-    loops = []
+COMPREHENSION_KINDS = {
+    ast.ListComp: 'list',
+    ast.SetComp: 'set',
+    ast.DictComp: 'dict',
+    ast.GeneratorExp: 'generator',
+}
 
-    # Then, we iterate over the iterators in the comprehension
-    for iterator in iterators:
-        # For each iterator, we generate a "for" loop that assigns the current
-        # value of the iterator to a variable
-        loop = f"for {iterator.target} in {iterator.iterable}:"
-        loops.append(loop)
+def parse_comprehension(comprehension):
+    # Parse the source of a single comprehension and return its ast node
+    try:
+        tree = ast.parse(comprehension.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Not valid Python: {comprehension!r} ({e.msg})")
+    if type(tree.body) not in COMPREHENSION_KINDS:
+        raise ValueError(f"Not a comprehension: {comprehension!r}")
+    return tree.body
 
-    # Finally, we iterate over the conditions in the comprehension
-    for condition in conditions:
-        # For each condition, we generate an "if" statement that checks the
-        # condition and adds the condition to the list of loops
-        if_stmt = f"if {condition}:"
-        loops.append(if_stmt)
+def unused_name(base, taken):
+    # base, or base_1, base_2, ... whichever isn't in taken
+    name = base
+    suffix = 0
+    while name in taken:
+        suffix += 1
+        name = f"{base}_{suffix}"
+    return name
 
-    # We return the list of generated loops
-    return loops
+def decompose_node(node, result='result', reserved=()):
+    # Turn a ListComp/SetComp/DictComp/GeneratorExp node into the equivalent
+    # loop code, assigning the collection (or generator) to `result`. Helper
+    # names the code introduces avoid every name in the node and in reserved.
+    kind = COMPREHENSION_KINDS[type(node)]
+    used = {n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+    taken = used | set(reserved) | {result}
+    # async for clauses and awaits need an async function around the loop
+    asynchronous = any(generator.is_async for generator in node.generators) or any(isinstance(n, ast.Await) for n in ast.walk(node))
+    lines = []
+    if kind == 'generator':
+        # Walrus targets in a generator expression bind in the enclosing scope,
+        # in a generator function they would be local
+        if any(isinstance(n, ast.NamedExpr) for n in ast.walk(node)):
+            raise ValueError("Assignment expressions in a generator expression have no loop equivalent")
+        # The first iterable of a generator expression is evaluated right away,
+        # everything else only when the generator runs, so pass it in
+        first = node.generators[0]
+        function = unused_name(f"{result}_generator", taken)
+        parameter = unused_name('iterable', taken | {function})
+        lines.append(f"{'async def' if asynchronous else 'def'} {function}({parameter}):")
+        depth = 1
+        generators = [ast.comprehension(target=first.target, iter=ast.Name(parameter), ifs=first.ifs, is_async=first.is_async)]
+        generators += node.generators[1:]
+    else:
+        # When the comprehension reads `result` (items = [i for i in items]),
+        # build into a temporary so it still sees the old value until the end
+        target = result
+        if result in used:
+            result = unused_name(result, taken)
+        start = {'list': '[]', 'set': 'set()', 'dict': '{}'}[kind]
+        lines.append(f"{result} = {start}")
+        depth = 0
+        generators = node.generators
+
+    # Each for clause opens a loop, and each of its ifs nests one level deeper,
+    # in the order they appear, so walrus targets bind in the same order too
+    for generator in generators:
+        loop = 'async for' if generator.is_async else 'for'
+        lines.append(f"{INDENT * depth}{loop} {ast.unparse(generator.target)} in {ast.unparse(generator.iter)}:")
+        depth += 1
+        for condition in generator.ifs:
+            lines.append(f"{INDENT * depth}if {ast.unparse(condition)}:")
+            depth += 1
+
+    if kind == 'list':
+        body = f"{result}.append({ast.unparse(node.elt)})"
+    elif kind == 'set':
+        body = f"{result}.add({ast.unparse(node.elt)})"
+    elif kind == 'dict':
+        # A dict comprehension evaluates the key before the value,
+        # result[k] = v would do it the other way round
+        key = unused_name(f"{result}_key", taken)
+        lines.append(f"{INDENT * depth}{key} = {ast.unparse(node.key)}")
+        body = f"{result}[{key}] = {ast.unparse(node.value)}"
+    else:
+        body = f"yield {ast.unparse(node.elt)}"
+    lines.append(f"{INDENT * depth}{body}")
+
+    if kind == 'generator':
+        lines.append(f"{result} = {function}({ast.unparse(node.generators[0].iter)})")
+    elif result != target:
+        lines.append(f"{target} = {result}")
+    return '\n'.join(lines)
+
+def decompose_comprehension(comprehension, result='result'):
+    return decompose_node(parse_comprehension(comprehension), result)
+
+# The original name, it handles every kind of comprehension now
+decompose_list_comprehension = decompose_comprehension
+
+def empty_collection(node):
+    # 'list', 'set' or 'dict' for [], set() and {}, else None
+    if isinstance(node, ast.List) and not node.elts:
+        return 'list'
+    if isinstance(node, ast.Dict) and not node.keys:
+        return 'dict'
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'set' and not node.args and not node.keywords:
+        return 'set'
+    return None
+
+def compose_loop(init, loop):
+    # The reverse of decompose_node: `name = []` followed by nested for/if
+    # statements that end in name.append(...) (or .add, or name[k] = v, or
+    # key = k; name[key] = v) becomes one comprehension node. Returns
+    # (name, node), or None when the statements don't have exactly that shape.
+    if not (isinstance(init, ast.Assign) and len(init.targets) == 1 and isinstance(init.targets[0], ast.Name)):
+        return None
+    name = init.targets[0].id
+    kind = empty_collection(init.value)
+    if kind is None:
+        return None
+
+    generators = []
+    body = [loop]
+    while len(body) == 1:
+        node = body[0]
+        if isinstance(node, (ast.For, ast.AsyncFor)) and not node.orelse:
+            generators.append(ast.comprehension(target=node.target, iter=node.iter, ifs=[], is_async=int(isinstance(node, ast.AsyncFor))))
+        elif isinstance(node, ast.If) and generators and not node.orelse:
+            generators[-1].ifs.append(node.test)
+        else:
+            break
+        body = node.body
+    if not generators:
+        return None
+
+    if kind == 'dict':
+        key = None
+        if len(body) == 2 and isinstance(body[0], ast.Assign) and len(body[0].targets) == 1 and isinstance(body[0].targets[0], ast.Name):
+            # the key evaluated first into a temporary, as decompose_node writes it
+            key = body[0].targets[0].id
+            key_value = body[0].value
+            body = body[1:]
+        node = body[0]
+        if not (len(body) == 1 and isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Subscript)
+                and isinstance(node.targets[0].value, ast.Name) and node.targets[0].value.id == name):
+            return None
+        if key is None:
+            result = ast.DictComp(key=node.targets[0].slice, value=node.value, generators=generators)
+        else:
+            if not (isinstance(node.targets[0].slice, ast.Name) and node.targets[0].slice.id == key
+                    and not any(isinstance(n, ast.Name) and n.id == key for n in ast.walk(node.value))):
+                return None
+            result = ast.DictComp(key=key_value, value=node.value, generators=generators)
+    else:
+        node = body[0]
+        method = 'append' if kind == 'list' else 'add'
+        if not (len(body) == 1 and isinstance(node, ast.Expr) and isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Attribute)
+                and isinstance(node.value.func.value, ast.Name) and node.value.func.value.id == name
+                and node.value.func.attr == method and len(node.value.args) == 1 and not node.value.keywords):
+            return None
+        element = node.value.args[0]
+        result = ast.ListComp(elt=element, generators=generators) if kind == 'list' else ast.SetComp(elt=element, generators=generators)
+
+    # The loop must not look at the collection it is building
+    for part in ast.walk(result):
+        if isinstance(part, ast.Name) and part.id == name:
+            return None
+    return name, result
 
 def main():
-    comprehension = '[elem for elem in abc if elem == 2]'
-    result = decompose_list_comprehension(comprehension)
-    print(result)
+    parser = argparse.ArgumentParser(description="Rewrite comprehensions as explicit loops")
+    parser.add_argument("comprehensions", nargs="*", default=['[elem for elem in abc if elem == 2]'], help="Comprehensions to decompose")
+    parser.add_argument("--result", type=str, default="result", help="Name the loop code assigns the result to")
+    args = parser.parse_args()
+
+    for comprehension in args.comprehensions:
+        print(f"# {comprehension}")
+        try:
+            print(decompose_comprehension(comprehension, args.result))
+        except ValueError as e:
+            print(f"# {e}")
+        print()
 
 if __name__ == '__main__':
     main()
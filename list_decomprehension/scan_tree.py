@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Find every comprehension in a source tree.
+
+Each .py file is parsed with ast in a process pool. Every top-level
+comprehension (one not inside another comprehension) is reported with its
+loop nesting depth and an estimated iteration count. The estimate uses the
+real length of range() calls with constant arguments and of literals, and
+--assumed_size for anything else.
+
+Optionally, comprehensions assigned straight to a name can be rewritten as
+explicit loops, or loops of the shape decompose_node produces can be turned
+back into comprehensions (--rewrite loops|comprehensions, with --diff to
+only print the change). Neither direction touches class bodies, or loop
+variables that are used elsewhere in the scope, since a loop leaks them and
+a comprehension doesn't.
+
+Results are cached on disk per file. A file whose mtime and size are
+unchanged is not read again. A file whose contents hash the same is not
+parsed again. Entries for files outside the scanned paths are kept.
+"""
+import io
+import os
+import ast
+import sys
+import json
+import math
+import difflib
+import hashlib
+import tokenize
+import collections
+import argparse
+import multiprocessing
+from list_decomprehension import COMPREHENSION_KINDS, decompose_node, compose_loop
+
+CACHE_VERSION = 1
+SKIP_DIRS = {'.git', '__pycache__', '.venv', 'venv', '.tox', '.nox', 'node_modules'}
+COMPREHENSION_TYPES = tuple(COMPREHENSION_KINDS)
+SCOPE_TYPES = (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)
+
+def iterable_size(node, assumed_size):
+    # len() of the iterable when it can be read off the source
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return len(node.elts)
+    if isinstance(node, ast.Dict):
+        return len(node.keys)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (str, bytes)):
+        return len(node.value)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'range' and not node.keywords:
+        args = [arg.value if isinstance(arg, ast.Constant) else None for arg in node.args]
+        if args and all(isinstance(arg, int) for arg in args) and len(args) <= 3:
+            try:
+                return len(range(*args))
+            except ValueError:
+                pass
+    return assumed_size
+
+def inner_comprehensions(node):
+    # comprehensions directly inside node, not inside those
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, COMPREHENSION_TYPES):
+            yield child
+        else:
+            yield from inner_comprehensions(child)
+
+def depth_and_cost(node, assumed_size):
+    # nested loop depth, and iterations of the innermost body
+    depth = len(node.generators)
+    cost = float(math.prod(iterable_size(generator.iter, assumed_size) for generator in node.generators))
+    inner = [depth_and_cost(child, assumed_size) for child in inner_comprehensions(node)]
+    if inner:
+        depth += max(d for d, c in inner)
+        cost *= max(c for d, c in inner)
+    return depth, cost
+
+def statement_lines(lines, first, last=None):
+    # the indent of the statements first..last, or None if they share their
+    # lines with other code or have comments the rewrite would drop
+    last = last or first
+    rest = lines[last.end_lineno - 1][last.end_col_offset:].strip()
+    indent = lines[first.lineno - 1][:first.col_offset]
+    if indent.strip() or rest or has_comment(lines[first.lineno - 1:last.end_lineno]):
+        return None
+    return indent
+
+def has_comment(span):
+    if not any('#' in line for line in span):
+        return False
+    try:
+        tokens = tokenize.generate_tokens(io.StringIO('\n'.join(line.strip() for line in span) + '\n').readline)
+        return any(token.type == tokenize.COMMENT for token in tokens)
+    except (tokenize.TokenError, SyntaxError):
+        return True
+
+def bodies(tree):
+    # every statement list in the module, with the node it belongs to
+    for node in ast.walk(tree):
+        for field in ('body', 'orelse', 'finalbody'):
+            body = getattr(node, field, None)
+            if isinstance(body, list) and body and isinstance(body[0], ast.stmt):
+                yield node, body
+        for handler in getattr(node, 'handlers', []):
+            yield handler, handler.body
+
+def enclosing_scopes(tree):
+    # the module, function or class every node belongs to
+    scopes = {}
+    def visit(node, scope):
+        for child in ast.iter_child_nodes(node):
+            scopes[child] = scope
+            visit(child, child if isinstance(child, SCOPE_TYPES) else scope)
+    visit(tree, tree)
+    return scopes
+
+def name_counts(node):
+    # how often each name is bound or read in node, nested scopes included
+    counts = collections.Counter()
+    for n in ast.walk(node):
+        if isinstance(n, ast.Name):
+            counts[n.id] += 1
+        elif isinstance(n, ast.arg):
+            counts[n.arg] += 1
+        elif isinstance(n, ast.alias):
+            counts[(n.asname or n.name).partition('.')[0]] += 1
+        elif isinstance(n, (ast.Global, ast.Nonlocal)):
+            counts.update(n.names)
+        elif isinstance(getattr(n, 'name', None), str) and not isinstance(n, ast.alias):
+            # def, class, except ... as name
+            counts[n.name] += 1
+    return counts
+
+def loop_rewrites(tree, lines):
+    # (first line, last line, replacement lines) for every comprehension assigned to a name
+    scopes = enclosing_scopes(tree)
+    scope_names = {}
+    for parent, body in bodies(tree):
+        for statement in body:
+            if not (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                    and isinstance(statement.targets[0], ast.Name) and isinstance(statement.value, COMPREHENSION_TYPES)):
+                continue
+            scope = scopes[statement]
+            if isinstance(scope, ast.ClassDef):
+                # the loop variables would become class attributes
+                continue
+            if scope not in scope_names:
+                scope_names[scope] = name_counts(scope)
+            comprehension = statement.value
+            if not isinstance(comprehension, ast.GeneratorExp):
+                # loop variables outlive the loop, so leave it alone if any of
+                # them is bound or read anywhere else in the scope
+                inside = name_counts(comprehension)
+                targets = {n.id for generator in comprehension.generators for n in ast.walk(generator.target) if isinstance(n, ast.Name)}
+                if any(scope_names[scope][target] > inside[target] for target in targets):
+                    continue
+            indent = statement_lines(lines, statement)
+            if indent is None:
+                continue
+            try:
+                code = decompose_node(comprehension, statement.targets[0].id, reserved=scope_names[scope])
+            except ValueError:
+                continue
+            yield statement.lineno, statement.end_lineno, [indent + line for line in code.split('\n')]
+
+def comprehension_rewrites(tree, lines):
+    # (first line, last line, replacement lines) for every `name = []` + loop that can be one comprehension
+    names = [(n.lineno, n.id) for n in ast.walk(tree) if isinstance(n, ast.Name)]
+    scopes = enclosing_scopes(tree)
+    for parent, body in bodies(tree):
+        if body and isinstance(scopes[body[0]], ast.ClassDef):
+            # a comprehension in a class body can't see the class's names
+            continue
+        for i in range(len(body) - 1):
+            composed = compose_loop(body[i], body[i + 1])
+            if composed is None:
+                continue
+            name, node = composed
+            # names the loop binds outlive it but not a comprehension, so leave
+            # it alone if any of them is used anywhere further down
+            targets = {n.id for n in ast.walk(body[i + 1]) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+            if any(line > body[i + 1].end_lineno and name_id in targets for line, name_id in names):
+                continue
+            indent = statement_lines(lines, body[i], body[i + 1])
+            if indent is None:
+                continue
+            yield body[i].lineno, body[i + 1].end_lineno, [f"{indent}{name} = {ast.unparse(node)}"]
+
+REWRITERS = {'loops': loop_rewrites, 'comprehensions': comprehension_rewrites}
+
+def analyze_source(source, assumed_size):
+    tree = ast.parse(source)
+    lines = source.splitlines()
+    found = []
+    for node in inner_comprehensions(tree):
+        depth, cost = depth_and_cost(node, assumed_size)
+        found.append({'line': node.lineno, 'col': node.col_offset, 'kind': COMPREHENSION_KINDS[type(node)],
+                      'depth': depth, 'cost': cost, 'source': ast.get_source_segment(source, node)})
+    found.sort(key=lambda c: (c['line'], c['col']))
+    rewrites = {mode: sum(1 for _ in rewriter(tree, lines)) for mode, rewriter in REWRITERS.items()}
+    return found, rewrites
+
+def analyze_file(job):
+    path, assumed_size = job
+    result = {'path': path, 'assumed_size': assumed_size}
+    try:
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        result.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size, sha256=hashlib.sha256(data).hexdigest())
+        result['comprehensions'], result['rewrites'] = analyze_source(data.decode('utf-8'), assumed_size)
+    except (SyntaxError, UnicodeDecodeError, ValueError, RecursionError, MemoryError, OSError) as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['comprehensions'], result['rewrites'] = [], {}
+    return result
+
+def rewrite_source(source, mode):
+    lines = source.splitlines()
+    edits = sorted(REWRITERS[mode](ast.parse(source), lines), reverse=True)
+    for first, last, replacement in edits:
+        lines[first - 1:last] = replacement
+    return '\n'.join(lines) + ('\n' if source.endswith('\n') else ''), len(edits)
+
+def find_sources(paths):
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and not d.startswith('.'))
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    yield os.path.join(root, name)
+
+def load_cache(cache_path):
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('version') != CACHE_VERSION:
+        return {}
+    return cache.get('files', {})
+
+def save_cache(cache_path, files):
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': CACHE_VERSION, 'files': files}, f)
+    os.replace(tmp_path, cache_path)
+
+def cached_result(cached, path, assumed_size):
+    # the cached analysis if the file is unchanged, judged by mtime and size
+    # first and by content hash when those moved
+    if cached is None or cached.get('assumed_size') != assumed_size:
+        return None
+    try:
+        stat = os.stat(path)
+        if stat.st_mtime_ns == cached['mtime_ns'] and stat.st_size == cached['size']:
+            # the path as given in this run, the cache may come from another cwd
+            return dict(cached, path=path)
+        with open(path, 'rb') as f:
+            if hashlib.sha256(f.read()).hexdigest() != cached['sha256']:
+                return None
+    except OSError:
+        return None
+    return dict(cached, path=path, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+
+def scan(paths, workers, cache_path, assumed_size):
+    cache = load_cache(cache_path) if cache_path else {}
+    results = {}
+    jobs = []
+    for path in find_sources(paths):
+        key = os.path.abspath(path)
+        cached = cached_result(cache.get(key), path, assumed_size)
+        if cached is not None:
+            results[key] = cached
+        else:
+            jobs.append((path, assumed_size))
+    parsed = len(jobs)
+    if workers == 1 or len(jobs) < 2:
+        fresh = map(analyze_file, jobs)
+    else:
+        pool = multiprocessing.Pool(workers)
+        fresh = pool.imap_unordered(analyze_file, jobs, chunksize=8)
+    for result in fresh:
+        results[os.path.abspath(result['path'])] = result
+    if workers != 1 and len(jobs) >= 2:
+        pool.close()
+        pool.join()
+    if cache_path:
+        # keep what other runs cached for other paths, minus deleted files and
+        # files that couldn't be read
+        cache.update(results)
+        save_cache(cache_path, {key: result for key, result in cache.items() if 'sha256' in result and os.path.exists(key)})
+    return [results[key] for key in sorted(results)], parsed
+
+def rewrite_files(results, mode, show_diff):
+    total = 0
+    for result in results:
+        if not result.get('rewrites', {}).get(mode):
+            continue
+        with open(result['path'], encoding='utf-8') as f:
+            source = f.read()
+        rewritten, count = rewrite_source(source, mode)
+        if not count:
+            continue
+        total += count
+        if show_diff:
+            sys.stdout.writelines(difflib.unified_diff(source.splitlines(True), rewritten.splitlines(True),
+                                                       result['path'], result['path']))
+        else:
+            with open(result['path'], 'w', encoding='utf-8') as f:
+                f.write(rewritten)
+    return total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report and rewrite comprehensions in a source tree")
+    parser.add_argument("paths", nargs="+", help="Files or directories to scan")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--cache", type=str, default=".decomprehension_cache.json", help="Cache file, empty to disable")
+    parser.add_argument("--assumed_size", type=int, default=100, help="Length assumed for iterables that can't be read off the source")
+    parser.add_argument("--top", type=int, default=20, help="Show this many of the most expensive comprehensions, 0 for all")
+    parser.add_argument("--rewrite", choices=sorted(REWRITERS), help="Rewrite comprehensions as loops, or loops as comprehensions")
+    parser.add_argument("--diff", action="store_true", help="With --rewrite, print a diff instead of writing the files")
+    args = parser.parse_args()
+
+    results, parsed = scan(args.paths, args.workers or multiprocessing.cpu_count(), args.cache, args.assumed_size)
+    found = [dict(c, path=r['path']) for r in results for c in r['comprehensions']]
+    for result in results:
+        if 'error' in result:
+            print(f"{result['path']}: skipped, {result['error']}", file=sys.stderr)
+
+    found.sort(key=lambda c: (-c['cost'], -c['depth'], c['path'], c['line']))
+    for c in found[:args.top or None]:
+        source = c['source'].replace('\n', ' ')
+        print(f"{c['path']}:{c['line']}:{c['col']}: {c['kind']} depth {c['depth']} cost ~{c['cost']:.3g}  {source[:80]}")
+    kinds = {}
+    for c in found:
+        kinds[c['kind']] = kinds.get(c['kind'], 0) + 1
+    max_depth = max((c['depth'] for c in found), default=0)
+    print(f"{len(found)} comprehensions in {len(results)} files ({parsed} parsed, {len(results) - parsed} from cache), "
+          f"{', '.join(f'{n} {k}' for k, n in sorted(kinds.items())) or 'none'}, deepest {max_depth}")
+
+    if args.rewrite:
+        total = rewrite_files(results, args.rewrite, args.diff)
+        print(f"{'Would rewrite' if args.diff else 'Rewrote'} {total} {'comprehensions as loops' if args.rewrite == 'loops' else 'loops as comprehensions'}")
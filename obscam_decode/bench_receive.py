@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Receive throughput benchmark for obscam_decode.
+
+Starts a local stand-in server that does the same handshake as the OBS
+source and then replays recorded frames (a --record recording, or a folder
+of JPEGs written with --output_folder) back-to-back, and times the old
+bytes-concatenation receive loop against FrameReceiver.
+"""
+import os
+import glob
+import time
+import socket
+import struct
+import argparse
+import multiprocessing
+from obscam_decode import FrameReceiver, send_initial_packet
+from recording import Recording
+
+def load_frames(frames_glob, frame_size, recording_path=None):
+    frames = []
+    if recording_path:
+        recording = Recording(recording_path)
+        frames = [bytes(data) for pts, data, recv_time in recording.frames()]
+        recording.close()
+    for path in sorted(glob.glob(frames_glob)):
+        with open(path, 'rb') as f:
+            frames.append(f.read())
+    if not frames:
+        # nothing recorded, fall back to a synthetic 1080p-sized payload
+        frames = [os.urandom(frame_size)]
+    return frames
+
+def serve_frames(listener, frames, count):
+    conn, _ = listener.accept()
+    with conn:
+        conn.recv(4096)  # initial GET packet
+        for i in range(count):
+            frame = frames[i % len(frames)]
+            conn.sendall(struct.pack('>QI', i, len(frame)) + frame)
+
+def receive_concat(sock):
+    # the receive loop as it was before FrameReceiver
+    frames = 0
+    total = 0
+    while True:
+        header = b''
+        while len(header) < 12:
+            chunk = sock.recv(12 - len(header))
+            if not chunk:
+                return frames, total
+            header += chunk
+        pts, length = struct.unpack('>QI', header)
+        data = b''
+        while len(data) < length:
+            chunk = sock.recv(length - len(data))
+            if not chunk:
+                return frames, total
+            data += chunk
+        frames += 1
+        total += len(data)
+
+def receive_into(sock):
+    receiver = FrameReceiver(sock)
+    frames = 0
+    total = 0
+    while True:
+        frame = receiver.read_frame()
+        if frame is None:
+            return frames, total
+        frames += 1
+        total += len(frame[1])
+
+def run(receive, frames, count):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    server = multiprocessing.Process(target=serve_frames, args=(listener, frames, count))
+    server.start()
+    sock = socket.create_connection(listener.getsockname())
+    send_initial_packet(sock)
+    start = time.perf_counter()
+    received, total = receive(sock)
+    elapsed = time.perf_counter() - start
+    sock.close()
+    server.join()
+    listener.close()
+    return received, total, elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the obscam_decode receive path")
+    parser.add_argument("--recording", type=str, help="Recording written with obscam_decode.py --record to replay")
+    parser.add_argument("--frames", type=str, default="frames/*.jpg", help="Glob of recorded JPEG frames to replay")
+    parser.add_argument("--count", type=int, default=2000, help="Number of frames to send")
+    parser.add_argument("--frame_size", type=int, default=600000, help="Synthetic frame size when no frames are found")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.frame_size, args.recording)
+    print(f"Replaying {args.count} frames from {len(frames)} sources, mean size {sum(map(len, frames)) // len(frames)} bytes")
+    for name, receive in (("bytes concat", receive_concat), ("recv_into", receive_into)):
+        received, total, elapsed = run(receive, frames, args.count)
+        print(f"{name:14s} {received} frames in {elapsed:.3f}s: {received / elapsed:8.1f} frames/s {total / elapsed / 1e6:8.1f} MB/s")
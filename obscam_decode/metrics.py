@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Frame-level metrics for obscam_decode.
+
+Counters and histograms for the receive loop and its outputs. A background
+thread logs a summary line every interval (rates are computed from the
+change since the previous line), and the same values can be served in
+Prometheus text format from a small local HTTP endpoint.
+"""
+import time
+import bisect
+import logging
+import threading
+import http.server
+
+# seconds; roughly 0.1ms to 10s
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # last slot is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return float('inf')
+
+class Metrics:
+    def __init__(self, pts_scale=1e-6):
+        self.pts_scale = pts_scale
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        # name -> callable, read when reporting (drop counts owned by other objects)
+        self.gauges = {}
+        self.last_pts = None
+        self.last_recv = None
+        self.summary_thread = None
+        self.http_server = None
+
+    def inc(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(value)
+
+    def gauge(self, name, func):
+        self.gauges[name] = func
+
+    def frame_received(self, pts, length, recv_wait, recv_time):
+        self.inc('frames_received')
+        self.inc('bytes_received', length)
+        self.observe('recv_wait_seconds', recv_wait)
+        if self.last_pts is not None:
+            # how far the arrival spacing strays from the PTS spacing
+            jitter = abs((pts - self.last_pts) * self.pts_scale - (recv_time - self.last_recv))
+            self.observe('pts_jitter_seconds', jitter)
+        self.last_pts = pts
+        self.last_recv = recv_time
+
+    def stage_times(self, source, stage_times):
+        # one histogram per consumer and stage (receive_decode, ocr_decode,
+        # video_decode, ...), the same stage costs differently in each
+        for stage, seconds in stage_times.items():
+            self.observe(f'{source}_{stage}_seconds', seconds)
+
+    def snapshot(self):
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {name: (list(h.counts), h.count, h.sum, h) for name, h in self.histograms.items()}
+        gauges = {}
+        for name, func in self.gauges.items():
+            try:
+                gauges[name] = func()
+            except Exception:
+                pass
+        return counters, histograms, gauges
+
+    def summary_line(self, previous, interval):
+        counters, histograms, gauges = self.snapshot()
+        delta = {name: value - previous.get(name, 0) for name, value in counters.items()}
+        parts = [
+            f"{delta.get('frames_received', 0) / interval:.1f} frames/s",
+            f"{delta.get('bytes_received', 0) / interval / 1e6:.2f} MB/s",
+        ]
+        for name, (counts, count, total, histogram) in sorted(histograms.items()):
+            if count:
+                label = name[:-len('_seconds')] if name.endswith('_seconds') else name
+                parts.append(f"{label} mean {total / count * 1000:.1f}ms p95<={histogram.quantile(0.95) * 1000:g}ms")
+        for name, value in sorted(gauges.items()):
+            parts.append(f"{name} {value}")
+        return ", ".join(parts), counters
+
+    def prometheus_text(self):
+        counters, histograms, gauges = self.snapshot()
+        lines = []
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE obscam_{name}_total counter")
+            lines.append(f"obscam_{name}_total {value}")
+        for name, (counts, count, total, histogram) in sorted(histograms.items()):
+            lines.append(f"# TYPE obscam_{name} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'obscam_{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'obscam_{name}_bucket{{le="+Inf"}} {count}')
+            lines.append(f"obscam_{name}_sum {total}")
+            lines.append(f"obscam_{name}_count {count}")
+        for name, value in sorted(gauges.items()):
+            lines.append(f"# TYPE obscam_{name} gauge")
+            lines.append(f"obscam_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def start_summary(self, interval):
+        def run():
+            previous = {}
+            while True:
+                time.sleep(interval)
+                line, previous = self.summary_line(previous, interval)
+                logging.info(f"Metrics: {line}")
+        self.summary_thread = threading.Thread(target=run, name="metrics-summary", daemon=True)
+        self.summary_thread.start()
+
+    def start_http(self, port, host="127.0.0.1"):
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.http_server = http.server.ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.http_server.serve_forever, name="metrics-http", daemon=True).start()
+        logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+    def close(self):
+        if self.http_server:
+            self.http_server.shutdown()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Receive several OBS camera feeds in one process.
+
+Every host:port gets its own asyncio task doing the same handshake and '>QI'
+framing as receive_video_feed(), reconnecting with exponential backoff when
+the connection drops. Received frames are handed to one shared thread pool
+for save/OCR/decode; a camera that already has too many frames in flight
+drops new ones instead of queueing them.
+"""
+import os
+import time
+import asyncio
+import logging
+import argparse
+import concurrent.futures
+import cv2
+from obscam_decode import INITIAL_PACKET, FRAME_HEADER, Frame, save_image, ocr_image
+
+class Camera:
+    def __init__(self, address, output_folder):
+        self.address = address
+        host, port = address.rsplit(':', 1)
+        self.host = host
+        self.port = int(port)
+        self.name = address.replace(':', '_')
+        self.output_folder = os.path.join(output_folder, self.name) if output_folder else None
+        self.in_flight = 0
+        self.frames = 0
+        self.dropped = 0
+        self.last_file_output_time = 0
+        self.last_ocr_time = 0
+        self.latest_image = None
+
+def process_frame(camera, pts, data, save, ocr, display):
+    # runs on the shared worker pool
+    frame = Frame(pts, data)
+    if save:
+        save_image(frame, camera.output_folder)
+    if ocr:
+        try:
+            ocr_result, ocr_coordinates = ocr_image(frame)
+            logging.info(f"[{camera.name}] OCR Result for {pts}: {ocr_result.strip()}")
+            logging.info(f"[{camera.name}] OCR Coordinates:\n{ocr_coordinates.strip()}")
+        except Exception as e:
+            logging.error(f"[{camera.name}] Error with OCR: {e}")
+    if display:
+        # decoded here, shown from the event loop thread
+        camera.latest_image = frame.image
+
+async def camera_feed(camera, pool, args):
+    loop = asyncio.get_running_loop()
+    backoff = args.min_backoff
+    while True:
+        writer = None
+        try:
+            reader, writer = await asyncio.open_connection(camera.host, camera.port)
+            logging.info(f"[{camera.name}] Connected to {camera.host}:{camera.port}")
+            writer.write(INITIAL_PACKET)
+            await writer.drain()
+            while True:
+                header = await reader.readexactly(FRAME_HEADER.size)
+                pts, length = FRAME_HEADER.unpack(header)
+                data = await reader.readexactly(length)
+                camera.frames += 1
+                # a frame made it through, the connection is healthy again
+                backoff = args.min_backoff
+
+                current_time = time.time()
+                save = bool(camera.output_folder) and current_time - camera.last_file_output_time >= args.file_output_interval
+                ocr = args.ocr and args.ocr_interval > 0 and current_time - camera.last_ocr_time >= args.ocr_interval
+                if not (save or ocr or args.display):
+                    continue
+                if camera.in_flight >= args.max_in_flight:
+                    camera.dropped += 1
+                    continue
+                if save:
+                    camera.last_file_output_time = current_time
+                if ocr:
+                    camera.last_ocr_time = current_time
+                camera.in_flight += 1
+                future = loop.run_in_executor(pool, process_frame, camera, pts, data, save, ocr, args.display)
+                future.add_done_callback(lambda f, camera=camera: frame_done(camera, f))
+        except asyncio.IncompleteReadError:
+            logging.error(f"[{camera.name}] Connection closed by the server.")
+        except OSError as e:
+            logging.error(f"[{camera.name}] Connection error: {e}")
+        finally:
+            if writer:
+                writer.close()
+        logging.info(f"[{camera.name}] Reconnecting in {backoff:.1f}s")
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, args.max_backoff)
+
+def frame_done(camera, future):
+    camera.in_flight -= 1
+    if future.exception():
+        logging.error(f"[{camera.name}] Error handling the image: {future.exception()}")
+
+async def display_loop(cameras):
+    while True:
+        for camera in cameras:
+            if camera.latest_image is not None:
+                cv2.imshow(f"Video Stream {camera.name}", camera.latest_image)
+                camera.latest_image = None
+        cv2.waitKey(1)
+        await asyncio.sleep(1 / 60)
+
+async def stats_loop(cameras, interval):
+    while True:
+        await asyncio.sleep(interval)
+        for camera in cameras:
+            logging.info(f"[{camera.name}] {camera.frames} frames, {camera.dropped} dropped, {camera.in_flight} in flight")
+
+async def run(args):
+    cameras = [Camera(address, args.output_folder) for address in args.cameras]
+    for camera in cameras:
+        if camera.output_folder:
+            os.makedirs(camera.output_folder, exist_ok=True)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as pool:
+        tasks = [camera_feed(camera, pool, args) for camera in cameras]
+        tasks.append(stats_loop(cameras, args.stats_interval))
+        if args.display:
+            tasks.append(display_loop(cameras))
+        await asyncio.gather(*tasks)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capture several video streams concurrently")
+    parser.add_argument("cameras", nargs="+", help="host:port of each feed")
+    parser.add_argument("--output_folder", type=str, help="Folder to save the images, one subfolder per feed")
+    parser.add_argument("--display", action="store_true", help="Display images")
+    parser.add_argument("--file_output_interval", type=float, default=0, help="File output interval in seconds (0 for continuous)")
+    parser.add_argument("--ocr", action="store_true", help="Enable OCR mode to extract digits and their coordinates")
+    parser.add_argument("--ocr_interval", type=float, default=2.5, help="OCR interval in seconds")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Shared worker threads for save/OCR/decode")
+    parser.add_argument("--max_in_flight", type=int, default=2, help="Frames per feed allowed in the worker pool before dropping")
+    parser.add_argument("--min_backoff", type=float, default=0.5, help="Initial reconnect delay in seconds")
+    parser.add_argument("--max_backoff", type=float, default=30, help="Maximum reconnect delay in seconds")
+    parser.add_argument("--stats_interval", type=float, default=10, help="Seconds between per-feed stats lines")
+    parser.add_argument("--debug", action="store_true", help="Enable debug verbosity")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
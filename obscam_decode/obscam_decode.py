@@ -6,7 +6,6 @@ and stores the video feed as an mp4 file. the data stream is an H264 video strea
 import socket
 import struct
 import logging
-from io import BytesIO
 from PIL import Image
 import argparse
 import os
@@ -14,30 +13,166 @@ import cv2
 import numpy as np
 import pytesseract
 import time
+import contextlib
 
 
+INITIAL_PACKET = b"GET /v4/video/jpg/1920x1080/port/1/os/win11.0/obs/29/client/220/nonce/5912/"
+
 def send_initial_packet(sock):
-    initial_packet = "GET /v4/video/jpg/1920x1080/port/1/os/win11.0/obs/29/client/220/nonce/5912/"
-    sock.sendall(initial_packet.encode())
-
-def display_image(img_data):
-    img = Image.open(BytesIO(img_data))
-    img = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-    cv2.imshow("Video Stream", img)
-    cv2.waitKey(1)  # Adjust the wait time as needed
-
-def save_image(img_data, output_folder, pts):
-    img = Image.open(BytesIO(img_data))
-    img.save(os.path.join(output_folder, f"frame_{pts}.jpg"))
-    logging.info(f"Saved image to {os.path.join(output_folder, f'frame_{pts}.jpg')}.")
-
-def ocr_image(img_data):
-    img = Image.open(BytesIO(img_data))
-    result = pytesseract.image_to_string(img, config='--psm 6 digits')
-    coordinates = pytesseract.image_to_osd(img, output_type=pytesseract.Output.STRING)
+    sock.sendall(INITIAL_PACKET)
+
+FRAME_HEADER = struct.Struct('>QI')
+# seconds per PTS tick for the units the --pts_units options accept
+PTS_UNITS = {'s': 1.0, 'ms': 1e-3, 'us': 1e-6, 'ns': 1e-9}
+
+def recv_exact(sock, view):
+    # fill the whole memoryview from the socket, False if the peer closed first
+    received = 0
+    while received < len(view):
+        count = sock.recv_into(view[received:])
+        if not count:
+            return False
+        received += count
+    return True
+
+class FrameReceiver:
+    """
+    Reads '>QI' framed JPEGs into one reusable buffer.
+
+    read_frame() returns (pts, view) where view is a memoryview into the
+    receive buffer. It is only valid until the next read_frame() call, so
+    anything that keeps a frame around has to copy it.
+    """
+    def __init__(self, sock, initial_size=1 << 20):
+        self.sock = sock
+        self.header = bytearray(FRAME_HEADER.size)
+        self.header_view = memoryview(self.header)
+        self.buffer = bytearray(initial_size)
+
+    def read_frame(self):
+        if not recv_exact(self.sock, self.header_view):
+            return None
+        # Extract PTS (8 bytes, big-endian) and length (4 bytes, big-endian)
+        pts, length = FRAME_HEADER.unpack(self.header)
+        if length > len(self.buffer):
+            # grow geometrically so a run of slightly bigger frames doesn't reallocate every time
+            self.buffer = bytearray(max(length, 2 * len(self.buffer)))
+        view = memoryview(self.buffer)[:length]
+        if not recv_exact(self.sock, view):
+            return None
+        return pts, view
+
+def decode_image(img_data, flags=cv2.IMREAD_COLOR):
+    # np.frombuffer wraps the receive buffer without copying it
+    return cv2.imdecode(np.frombuffer(img_data, np.uint8), flags)
+
+class Frame:
+    """
+    One received JPEG frame shared by all outputs.
+
+    The JPEG is decoded lazily the first time a consumer asks for .image and
+    the ndarray is reused by everyone after that. CPU time spent in each
+    stage is collected in stage_times.
+    """
+    def __init__(self, pts, data):
+        self.pts = pts
+        self.data = data
+        self._image = None
+        self._pil_image = None
+        self.stage_times = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.thread_time()
+        try:
+            yield
+        finally:
+            self.stage_times[name] = self.stage_times.get(name, 0) + time.thread_time() - start
+
+    @property
+    def image(self):
+        # BGR ndarray, decoded at most once
+        if self._image is None:
+            with self.stage("decode"):
+                self._image = decode_image(self.data)
+        return self._image
+
+    @property
+    def pil_image(self):
+        # RGB view for pytesseract, built from the shared decode
+        if self._pil_image is None:
+            image = self.image
+            with self.stage("decode"):
+                self._pil_image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        return self._pil_image
+
+def display_image(frame):
+    image = frame.image
+    with frame.stage("display"):
+        cv2.imshow("Video Stream", image)
+        cv2.waitKey(1)  # Adjust the wait time as needed
+
+def save_image(frame, output_folder):
+    # the payload already is a JPEG, write it out as-is
+    path = os.path.join(output_folder, f"frame_{frame.pts}.jpg")
+    with frame.stage("save"):
+        with open(path, 'wb') as f:
+            f.write(frame.data)
+    logging.info(f"Saved image to {path}.")
+
+def ocr_image(frame):
+    img = frame.pil_image
+    with frame.stage("ocr"):
+        result = pytesseract.image_to_string(img, config='--psm 6 digits')
+        coordinates = pytesseract.image_to_osd(img, output_type=pytesseract.Output.STRING)
     return result, coordinates
 
-def receive_video_feed(host, port, output_folder, display_images, file_output_interval, ocr_mode, ocr_interval, debug):
+def parse_roi(text):
+    # "x,y,w,h" in frame pixels, or "auto" to learn it from the first frame
+    if text == "auto":
+        return "auto"
+    x, y, w, h = (int(elem) for elem in text.split(','))
+    return (x, y, w, h)
+
+def crop_roi(frame, roi, preprocess=False):
+    x, y, w, h = roi
+    with frame.stage("crop"):
+        # slicing is a view into the shared decode, no copy
+        img = frame.image[y:y+h, x:x+w]
+        if preprocess:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            _, img = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        else:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    return img
+
+def ocr_roi(frame, roi, preprocess=False):
+    img = crop_roi(frame, roi, preprocess)
+    with frame.stage("ocr"):
+        result = pytesseract.image_to_string(img, config='--psm 6 digits')
+    return result
+
+def learn_roi(frame, margin=16):
+    # one full-frame pass with word boxes; the region is the padded bounding
+    # box of everything tesseract read as digits
+    with frame.stage("ocr"):
+        data = pytesseract.image_to_data(frame.pil_image, config='--psm 6 digits', output_type=pytesseract.Output.DICT)
+    boxes = [(data['left'][i], data['top'][i], data['width'][i], data['height'][i])
+             for i, text in enumerate(data['text']) if any(c.isdigit() for c in text)]
+    text = ' '.join(elem for elem in data['text'] if elem.strip())
+    if not boxes:
+        return text, None
+    height, width = frame.image.shape[:2]
+    x0 = max(min(x for x, y, w, h in boxes) - margin, 0)
+    y0 = max(min(y for x, y, w, h in boxes) - margin, 0)
+    x1 = min(max(x + w for x, y, w, h in boxes) + margin, width)
+    y1 = min(max(y + h for x, y, w, h in boxes) + margin, height)
+    return text, (x0, y0, x1 - x0, y1 - y0)
+
+def format_stage_times(stage_times, count=1):
+    return ", ".join(f"{name} {seconds / count * 1000:.2f}ms" for name, seconds in sorted(stage_times.items()))
+
+def receive_video_feed(host, port, output_folder, display_images, file_output_interval, ocr_worker, ocr_interval, debug, symbol_stream=None, recorder=None, video_sink=None, metrics=None):
     # setup_logging(debug)
 
     # Create a socket connection
@@ -50,67 +185,69 @@ def receive_video_feed(host, port, output_folder, display_images, file_output_in
         logging.error("Connection refused. Make sure the server is running.")
         return
 
+    receiver = FrameReceiver(sock)
     last_file_output_time = 0
     last_ocr_time = 0
+    frame_count = 0
+    stage_totals = {}
 
     try:
         while True:
-            header = b''
-            while len(header) < 12:
-                chunk = sock.recv(12 - len(header))
-                if not chunk:
-                    logging.error("Connection closed by the server.")
-                    break
-                header += chunk
-
-            if not header:
+            recv_start = time.perf_counter()
+            frame = receiver.read_frame()
+            recv_wait = time.perf_counter() - recv_start
+            if frame is None:
+                logging.error("Connection closed by the server.")
                 break
-
-            # Extract PTS (8 bytes, big-endian) and length (4 bytes, big-endian)
-            pts, length = struct.unpack('>QI', header)
+            pts, data = frame
             if debug:
-                logging.debug(f"PTS: {pts}, Length: {length}")
+                logging.debug(f"PTS: {pts}, Length: {len(data)}")
 
-            data = b''
-            while len(data) < length:
-                chunk = sock.recv(length - len(data))
-                if not chunk:
-                    logging.error("Connection closed by the server.")
-                    break
-                data += chunk
+            current_time = time.time()
+            frame = Frame(pts, data)
+            if metrics:
+                metrics.frame_received(pts, len(data), recv_wait, current_time)
 
-            if debug:
-                logging.debug(f"Received Data Length: {len(data)}")  # Print the length of received data
+            try:
+                if recorder:
+                    recorder.write(pts, data, current_time)
 
-            if not data:
-                break
+                if video_sink:
+                    video_sink.submit(pts, data)
 
-            current_time = time.time()
+                if symbol_stream:
+                    # hands the frame to the detector thread, never blocks
+                    symbol_stream.submit(pts, data, current_time)
 
-            try:
                 if display_images:
-                    display_image(data)
+                    display_image(frame)
 
-                if file_output_interval > 0 and current_time - last_file_output_time >= file_output_interval:
-                    save_image(data, output_folder, pts)
+                if output_folder and current_time - last_file_output_time >= file_output_interval:
+                    save_image(frame, output_folder)
                     last_file_output_time = current_time
 
-                if ocr_mode and ocr_interval > 0 and current_time - last_ocr_time >= ocr_interval:
-                    try:
-                        ocr_result, ocr_coordinates = ocr_image(data)
-                    except Exception as e:
-                        logging.error(f"Error with OCR: {e}")
+                if ocr_worker and current_time - last_ocr_time >= ocr_interval:
+                    # queued for the OCR pool, results are logged as they come back
+                    ocr_worker.submit(pts, data)
                     last_ocr_time = current_time
-                    logging.info(f"OCR Result: {ocr_result.strip()}")
-                    logging.info(f"OCR Coordinates:\n{ocr_coordinates.strip()}")
 
             except Exception as e:
                 logging.error(f"Error handling the image: {e}")
 
+            frame_count += 1
+            for name, seconds in frame.stage_times.items():
+                stage_totals[name] = stage_totals.get(name, 0) + seconds
+            if metrics:
+                metrics.stage_times('receive', frame.stage_times)
+            if debug and frame.stage_times:
+                logging.debug(f"Frame {pts} CPU time: {format_stage_times(frame.stage_times)}")
+
     except KeyboardInterrupt:
         pass
     finally:
         sock.close()
+        if stage_totals:
+            logging.info(f"Mean CPU time per frame over {frame_count} frames: {format_stage_times(stage_totals, frame_count)}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Capture a video stream as JPEG images with various modes")
@@ -120,7 +257,22 @@ if __name__ == "__main__":
     parser.add_argument("--display", action="store_true", help="Display images")
     parser.add_argument("--file_output_interval", type=float, default=0, help="File output interval in seconds (0 for continuous)")
     parser.add_argument("--ocr", action="store_true", help="Enable OCR mode to extract digits and their coordinates")
-    parser.add_argument("--ocr_interval", type=float, default=2.5, help="OCR interval in seconds")
+    parser.add_argument("--ocr_interval", type=float, default=2.5, help="OCR interval in seconds (0 to OCR the latest frame whenever a worker is free)")
+    parser.add_argument("--ocr_roi", type=parse_roi, help="Only OCR this region, as x,y,w,h or 'auto' to learn it from the first frame")
+    parser.add_argument("--ocr_preprocess", action="store_true", help="Grayscale and threshold the OCR region before tesseract")
+    parser.add_argument("--ocr_workers", type=int, default=1, help="Number of OCR worker processes")
+    parser.add_argument("--symbols", action="store_true", help="Run symbol_finder detection on the stream and emit JSON events")
+    parser.add_argument("--symbols_output", type=str, help="File to append symbol detection events to (default stdout)")
+    parser.add_argument("--video_output", type=str, help="Write the stream as MP4 segments named <prefix>_<pts>.mp4")
+    parser.add_argument("--video_backend", choices=("cv2", "ffmpeg"), default="cv2", help="Encode with cv2.VideoWriter or pipe the JPEGs into ffmpeg/libx264")
+    parser.add_argument("--video_fps", type=float, default=30, help="Output frame rate of the MP4 segments")
+    parser.add_argument("--segment_seconds", type=float, default=300, help="Start a new MP4 segment after this many seconds (0 for no limit)")
+    parser.add_argument("--segment_mb", type=float, default=0, help="Start a new MP4 segment after this many MB (0 for no limit)")
+    parser.add_argument("--pts_units", choices=sorted(PTS_UNITS), default="us", help="Unit of the stream PTS values")
+    parser.add_argument("--record", type=str, help="Record the raw stream to this file (replay it with replay_server.py)")
+    parser.add_argument("--record_overwrite", action="store_true", help="Replace an existing recording of the same name")
+    parser.add_argument("--metrics_interval", type=float, default=0, help="Log a metrics summary line every N seconds (0 to disable)")
+    parser.add_argument("--metrics_port", type=int, default=0, help="Serve Prometheus text metrics on localhost:PORT/metrics (0 to disable)")
     parser.add_argument("--debug", action="store_true", help="Enable debug verbosity")
 
     args = parser.parse_args()
@@ -132,12 +284,59 @@ if __name__ == "__main__":
     console.setFormatter(formatter)
     logging.getLogger('').addHandler(console)
 
-    if not args.display and not args.output_folder and not args.ocr:
-        logging.error("You must provide at least one of --display, --output_folder, or --ocr.")
+    if not args.display and not args.output_folder and not args.ocr and not args.symbols and not args.record and not args.video_output:
+        logging.error("You must provide at least one of --display, --output_folder, --ocr, --symbols, --record, or --video_output.")
     else:
         if args.output_folder and not os.path.exists(args.output_folder):
             os.makedirs(args.output_folder)
 
+        metrics = None
+        if args.metrics_interval > 0 or args.metrics_port:
+            from metrics import Metrics
+            metrics = Metrics(PTS_UNITS[args.pts_units])
+            if args.metrics_interval > 0:
+                metrics.start_summary(args.metrics_interval)
+            if args.metrics_port:
+                metrics.start_http(args.metrics_port)
+
+        symbol_stream = None
+        if args.symbols:
+            from symbol_stream import SymbolStream
+            symbols_output = open(args.symbols_output, 'a') if args.symbols_output else None
+            symbol_stream = SymbolStream(symbols_output)
+            if metrics:
+                metrics.gauge('symbols_dropped', lambda: symbol_stream.dropped)
+
+        ocr_worker = None
+        if args.ocr:
+            from ocr_worker import OcrWorker, log_result
+            on_result = log_result
+            if metrics:
+                def on_result(result):
+                    metrics.stage_times('ocr', result.get('cpu_times', {}))
+                    metrics.observe('ocr_latency_seconds', result['latency'])
+                    log_result(result)
+            ocr_worker = OcrWorker(args.ocr_workers, on_result, roi=args.ocr_roi, preprocess=args.ocr_preprocess)
+            if metrics:
+                metrics.gauge('ocr_dropped', lambda: ocr_worker.dropped)
+
+        recorder = None
+        if args.record:
+            from recording import FrameRecorder
+            try:
+                recorder = FrameRecorder(args.record, args.record_overwrite)
+            except FileExistsError as e:
+                raise SystemExit(f"{e.filename} already exists, pass --record_overwrite to replace it")
+
+        video_sink = None
+        if args.video_output:
+            from video_sink import VideoSink
+            video_sink = VideoSink(args.video_output, args.video_backend, args.video_fps, PTS_UNITS[args.pts_units],
+                                   args.segment_seconds, int(args.segment_mb * 1e6))
+            if metrics:
+                video_sink.metrics = metrics
+                metrics.gauge('video_dropped', lambda: video_sink.dropped)
+
         logging.info(f"Connecting to {args.host}:{args.port}...")
         receive_video_feed(
             args.host,
@@ -145,8 +344,23 @@ if __name__ == "__main__":
             args.output_folder,
             args.display,
             args.file_output_interval,
-            args.ocr,
+            ocr_worker,
             args.ocr_interval,
-            args.debug
+            args.debug,
+            symbol_stream,
+            recorder,
+            video_sink,
+            metrics
         )
+        if symbol_stream:
+            symbol_stream.close()
+        if ocr_worker:
+            ocr_worker.close()
+        if video_sink:
+            video_sink.close()
+        if recorder:
+            recorder.close()
+            logging.info(f"Recorded {recorder.frames} frames to {recorder.data_path}")
+        if metrics:
+            metrics.close()
         logging.info("Video stream capture completed.")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Background OCR for obscam_decode.
+
+Tesseract is run in a small process pool so the receive loop keeps draining
+the socket while OCR is busy. At most one job per worker process is in
+flight; when all of them are busy a newly submitted frame takes the single
+pending slot, replacing (dropping) whatever frame was waiting there, so OCR
+always works on the most recent frame it can. Results are handed to
+on_result together with the PTS of the frame they belong to.
+
+With a region configured only that crop is OCRed. With roi="auto" the first
+finished frame runs a full-frame pass, and the region it learns is used for
+every frame after it.
+"""
+import time
+import logging
+import threading
+import multiprocessing
+import concurrent.futures
+from obscam_decode import Frame, ocr_image, ocr_roi, learn_roi
+
+def ocr_job(pts, data, submit_time, roi=None, preprocess=False):
+    # runs in the worker process. errors are passed back as text, some
+    # pytesseract exceptions can't be unpickled and would break the pool
+    frame = Frame(pts, data)
+    learned_roi = None
+    try:
+        if roi == "auto":
+            result, learned_roi = learn_roi(frame)
+            coordinates = f"Learned OCR region: {learned_roi}"
+        elif roi:
+            result = ocr_roi(frame, roi, preprocess)
+            coordinates = f"OCR region: {roi}"
+        else:
+            result, coordinates = ocr_image(frame)
+    except Exception as e:
+        return dict(pts = pts, error = f"{type(e).__name__}: {e}", submitted = submit_time)
+    return dict(pts = pts, result = result, coordinates = coordinates, roi = learned_roi,
+                submitted = submit_time, cpu_times = frame.stage_times)
+
+def log_result(result):
+    if result.get('error'):
+        logging.error(f"Error with OCR on frame {result['pts']}: {result['error']}")
+        return
+    logging.info(f"OCR Result for frame {result['pts']} ({result['latency'] * 1000:.0f}ms): {result['result'].strip()}")
+    logging.info(f"OCR Coordinates:\n{result['coordinates'].strip()}")
+
+class OcrWorker:
+    def __init__(self, workers=1, on_result=log_result, roi=None, preprocess=False):
+        self.workers = workers
+        self.on_result = on_result
+        # None for full frames, (x, y, w, h), or "auto" until a region is learned
+        self.roi = roi
+        self.preprocess = preprocess
+        # the workers start on the first submit, when other threads (symbols,
+        # video, metrics) may hold locks, so they must not be forked
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method))
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.pending = None
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.closed = False
+
+    def submit(self, pts, data):
+        # never blocks; the frame is copied because the receive buffer gets reused
+        job = (pts, bytes(data), time.time())
+        with self.lock:
+            self.submitted += 1
+            if self.in_flight >= self.workers:
+                if self.pending is not None:
+                    self.dropped += 1
+                self.pending = job
+                return
+            self.in_flight += 1
+        self._start(job)
+
+    def _start(self, job):
+        future = self.pool.submit(ocr_job, *job, self.roi, self.preprocess)
+        future.add_done_callback(lambda f, job=job: self._done(job, f))
+
+    def _done(self, job, future):
+        pts, _, submit_time = job
+        try:
+            result = future.result()
+        except Exception as e:
+            result = dict(pts = pts, error = e, submitted = submit_time)
+        result['latency'] = time.time() - submit_time
+        with self.lock:
+            if result.get('roi') and self.roi == "auto":
+                # every later frame only OCRs the learned region
+                self.roi = result['roi']
+                logging.info(f"Learned OCR region {self.roi} from frame {pts}")
+            self.completed += 1
+            job, self.pending = self.pending, None
+            if job is None or self.closed:
+                job = None
+                self.in_flight -= 1
+        if job is not None:
+            self._start(job)
+        try:
+            self.on_result(result)
+        except Exception as e:
+            logging.error(f"Error delivering OCR result for frame {pts}: {e}")
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.pending = None
+        self.pool.shutdown(wait=True)
+        logging.info(f"OCR: {self.completed} completed, {self.dropped} dropped of {self.submitted} submitted frames")
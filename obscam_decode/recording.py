@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Recording container for obscam_decode streams.
+
+A recording is two files:
+  <name>.obsrec  an 8 byte magic followed by the frames exactly as they came
+                 off the wire ('>QI' header + JPEG payload)
+  <name>.obsidx  one '>QQIQ' entry per frame: pts, offset of the payload in
+                 the .obsrec file, payload length, receive time in ns
+The index is appended per frame, so a recording cut short by a crash is
+still readable up to the last complete entry. Reading maps the data file
+and uses the index for random access by frame number or PTS.
+"""
+import os
+import mmap
+import time
+import bisect
+import struct
+from obscam_decode import FRAME_HEADER
+
+MAGIC = b'OBSREC1\0'
+INDEX_ENTRY = struct.Struct('>QQIQ')
+
+def recording_paths(path):
+    base = path[:-len('.obsrec')] if path.endswith('.obsrec') else path
+    return base + '.obsrec', base + '.obsidx'
+
+class FrameRecorder:
+    def __init__(self, path, overwrite=False):
+        self.data_path, self.index_path = recording_paths(path)
+        # an existing recording is only replaced when asked to, FileExistsError otherwise
+        mode = 'wb' if overwrite else 'xb'
+        self.data_file = open(self.data_path, mode)
+        try:
+            self.index_file = open(self.index_path, mode)
+        except OSError:
+            self.data_file.close()
+            os.remove(self.data_path)
+            raise
+        self.data_file.write(MAGIC)
+        self.offset = len(MAGIC)
+        self.frames = 0
+
+    def write(self, pts, data, recv_time=None):
+        recv_ns = int((recv_time if recv_time is not None else time.time()) * 1e9)
+        self.data_file.write(FRAME_HEADER.pack(pts, len(data)))
+        self.data_file.write(data)
+        payload_offset = self.offset + FRAME_HEADER.size
+        self.offset = payload_offset + len(data)
+        # data first, so an index entry never points past the end of the data file
+        self.data_file.flush()
+        self.index_file.write(INDEX_ENTRY.pack(pts, payload_offset, len(data), recv_ns))
+        self.index_file.flush()
+        self.frames += 1
+
+    def close(self):
+        self.data_file.close()
+        self.index_file.close()
+
+class Recording:
+    def __init__(self, path):
+        self.data_path, self.index_path = recording_paths(path)
+        with open(self.index_path, 'rb') as f:
+            index_bytes = f.read()
+        # ignore a trailing partial entry from an interrupted recording
+        usable = len(index_bytes) - len(index_bytes) % INDEX_ENTRY.size
+        self.index = list(INDEX_ENTRY.iter_unpack(index_bytes[:usable]))
+        self.pts_list = [entry[0] for entry in self.index]
+        self.data_file = open(self.data_path, 'rb')
+        self.data = mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.data_path} is not an obscam recording")
+
+    def __len__(self):
+        return len(self.index)
+
+    def frame(self, i):
+        # (pts, payload view, receive time in seconds), the view points into the mmap
+        pts, offset, length, recv_ns = self.index[i]
+        return pts, memoryview(self.data)[offset:offset+length], recv_ns / 1e9
+
+    def wire_bytes(self, i):
+        # header + payload exactly as the server sent it
+        pts, offset, length, recv_ns = self.index[i]
+        return memoryview(self.data)[offset-FRAME_HEADER.size:offset+length]
+
+    def find_pts(self, pts):
+        # index of the first frame with a PTS at or after pts (PTS is monotonic in a stream)
+        return bisect.bisect_left(self.pts_list, pts)
+
+    def frames(self, start=0):
+        for i in range(start, len(self.index)):
+            yield self.frame(i)
+
+    def close(self):
+        self.data.close()
+        self.data_file.close()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OBS camera source that replays a recording.
+
+Accepts the same initial GET packet as the real source and streams the
+recorded '>QI' frames back. Pacing can follow the recorded PTS, the recorded
+receive times, or be as fast as the socket allows.
+"""
+import time
+import socket
+import logging
+import argparse
+import threading
+from obscam_decode import PTS_UNITS
+from recording import Recording
+
+def frame_times(recording, cadence, pts_scale):
+    # seconds since the first frame for every frame, or None when unpaced
+    if cadence == 'fast' or len(recording) == 0:
+        return None
+    if cadence == 'pts':
+        stamps = [entry[0] * pts_scale for entry in recording.index]
+    else:
+        stamps = [entry[3] / 1e9 for entry in recording.index]
+    return [stamp - stamps[0] for stamp in stamps]
+
+def serve_client(conn, address, recording, args):
+    with conn:
+        request = conn.recv(4096)
+        if not request.startswith(b'GET '):
+            logging.error(f"Unexpected initial packet from {address}: {request[:64]!r}")
+            return
+        logging.info(f"Replaying {len(recording)} frames to {address}")
+        times = frame_times(recording, args.cadence, PTS_UNITS[args.pts_units])
+        start_index = recording.find_pts(args.start_pts) if args.start_pts else 0
+        if start_index >= len(recording):
+            # an empty recording, or --start_pts past the last frame. nothing
+            # to send, and --loop would spin forever sending nothing
+            logging.error(f"No frames to replay to {address} (recording has {len(recording)} frames, start PTS {args.start_pts})")
+            return
+        sent = 0
+        try:
+            while True:
+                start = time.perf_counter()
+                offset = times[start_index] if times else 0
+                for i in range(start_index, len(recording)):
+                    if times:
+                        delay = times[i] - offset - (time.perf_counter() - start)
+                        if delay > 0:
+                            time.sleep(delay)
+                    conn.sendall(recording.wire_bytes(i))
+                    sent += 1
+                if not args.loop:
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            logging.info(f"{address} disconnected")
+        logging.info(f"Sent {sent} frames to {address}")
+
+def serve(recording, args):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((args.host, args.port))
+    listener.listen()
+    logging.info(f"Replay server listening on {listener.getsockname()[0]}:{listener.getsockname()[1]}")
+    with listener:
+        while True:
+            conn, address = listener.accept()
+            threading.Thread(target=serve_client, args=(conn, address, recording, args), daemon=True).start()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded video stream")
+    parser.add_argument("recording", type=str, help="Recording written with obscam_decode.py --record")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=4747, help="Port to listen on")
+    parser.add_argument("--cadence", choices=("pts", "recv", "fast"), default="pts", help="Pace by recorded PTS, by recorded receive times, or send as fast as possible")
+    parser.add_argument("--pts_units", choices=sorted(PTS_UNITS), default="us", help="Unit of the stream PTS values")
+    parser.add_argument("--start_pts", type=int, default=0, help="Start replay at the first frame with this PTS or later")
+    parser.add_argument("--loop", action="store_true", help="Loop the recording until the client disconnects")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        serve(Recording(args.recording), args)
+    except KeyboardInterrupt:
+        pass
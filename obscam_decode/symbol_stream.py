@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# streaming symbol detection on frames coming out of receive_video_feed()
+#
+# the receive loop hands every frame to SymbolStream.submit(), which never
+# blocks: there is a single pending slot and a newer frame replaces whatever
+# is still waiting there, so when the detector falls behind frames are dropped
+# instead of backing up the socket. a detector thread decodes the JPEG, runs
+# SIFT and the symbol_finder matcher against the in-memory symbol library and
+# writes one JSON event per processed frame.
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import numpy as np
+import cv2
+
+SYMBOL_FINDER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'symbol_finder')
+sys.path.insert(0, SYMBOL_FINDER_DIR)
+from symbol_cache import load_symbols
+from symbol_matcher import SymbolMatcher, locate_symbols
+
+class SymbolStream:
+    def __init__(self, output=None, symbols_glob=None, cache_dir=None):
+        self.output = output or sys.stdout
+        self.sift = cv2.SIFT_create()
+        self.symbols_list = load_symbols(
+            self.sift,
+            symbols_glob or os.path.join(SYMBOL_FINDER_DIR, 'symbols', '*.png'),
+            cache_dir or os.path.join(SYMBOL_FINDER_DIR, '.symbol_cache'))
+        self.matcher = SymbolMatcher(self.symbols_list)
+
+        self.condition = threading.Condition()
+        self.pending = None
+        self.running = True
+        self.submitted = 0
+        self.dropped = 0
+        self.processed = 0
+        self.latencies = []
+        self.thread = threading.Thread(target=self.run, name="symbol-detector", daemon=True)
+        self.thread.start()
+
+    def submit(self, pts, img_data, recv_time):
+        # latest frame wins, never blocks the receive loop
+        with self.condition:
+            if self.pending is not None:
+                self.dropped += 1
+            self.pending = (pts, bytes(img_data), recv_time)
+            self.submitted += 1
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and self.running:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                pts, img_data, recv_time = self.pending
+                self.pending = None
+            try:
+                self.emit(self.detect(pts, img_data, recv_time))
+            except Exception as e:
+                logging.error(f"Error detecting symbols in frame {pts}: {e}")
+
+    def detect(self, pts, img_data, recv_time):
+        start_time = time.time()
+        img = cv2.imdecode(np.frombuffer(img_data, np.uint8), cv2.IMREAD_GRAYSCALE)
+        test_kp, test_des = self.sift.detectAndCompute(img, None)
+        symbol_matches = self.matcher.match(test_des)
+        detections = locate_symbols(self.symbols_list, symbol_matches, test_kp)
+        done_time = time.time()
+        latency = done_time - recv_time
+        self.latencies.append(latency)
+        self.processed += 1
+        return dict(
+            event = "symbols",
+            pts = pts,
+            received = recv_time,
+            queue_ms = round((start_time - recv_time) * 1000, 2),
+            detect_ms = round((done_time - start_time) * 1000, 2),
+            latency_ms = round(latency * 1000, 2),
+            dropped = self.dropped,
+            symbols = [dict(name = d['name'], inliers = d['inliers'],
+                            corners = [[round(x, 1), round(y, 1)] for x, y in d['corners']])
+                       for d in detections],
+        )
+
+    def emit(self, event):
+        self.output.write(json.dumps(event) + '\n')
+        self.output.flush()
+
+    def latency_summary(self):
+        if not self.latencies:
+            return "no frames processed"
+        latencies = np.array(self.latencies) * 1000
+        return (f"{self.processed} processed, {self.dropped} dropped of {self.submitted} frames; "
+                f"latency ms mean {latencies.mean():.1f} p50 {np.percentile(latencies, 50):.1f} "
+                f"p95 {np.percentile(latencies, 95):.1f} max {latencies.max():.1f}")
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        logging.info(f"Symbol detection: {self.latency_summary()}")
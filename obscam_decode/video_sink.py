@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Segmented MP4 output for obscam_decode.
+
+Frames are queued (bounded, dropping when full) to a writer thread that
+encodes them either with cv2.VideoWriter or by piping the original JPEG
+bytes into an ffmpeg process (libx264, so no decode happens in Python at
+all). The output has a constant frame rate; each frame is placed by its
+PTS, so frames are repeated to fill gaps and skipped when they arrive
+faster than the output rate. A new segment is started once the current one
+is longer than segment_seconds of PTS time or bigger than segment_bytes.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+import subprocess
+import cv2
+from obscam_decode import Frame
+
+class Cv2Encoder:
+    def __init__(self, path, fps, fourcc='mp4v'):
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.writer = None
+        self.size = None
+
+    def prepare(self, frame):
+        # decode outside the encode stage so the two are timed separately
+        frame.image
+
+    def accepts(self, frame):
+        # VideoWriter silently drops frames of any other size than the first
+        return self.size is None or frame.image.shape[:2] == self.size
+
+    def write(self, frame, repeat):
+        image = frame.image
+        if self.writer is None:
+            # the size is only known once the first frame is decoded
+            height, width = self.size = image.shape[:2]
+            self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (width, height))
+            if not self.writer.isOpened():
+                raise IOError(f"Could not open {self.path} for writing")
+        for _ in range(repeat):
+            self.writer.write(image)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+        return 0
+
+class FfmpegEncoder:
+    def __init__(self, path, fps, crf=23, preset='veryfast'):
+        self.path = path
+        self.process = subprocess.Popen(
+            ['ffmpeg', '-loglevel', 'error', '-y',
+             '-f', 'image2pipe', '-c:v', 'mjpeg', '-framerate', str(fps), '-i', '-',
+             '-c:v', 'libx264', '-preset', preset, '-crf', str(crf), '-pix_fmt', 'yuv420p',
+             '-movflags', '+faststart', path],
+            stdin=subprocess.PIPE)
+
+    def prepare(self, frame):
+        pass
+
+    def accepts(self, frame):
+        # ffmpeg scales frames of a different size to the first one
+        return True
+
+    def write(self, frame, repeat):
+        # ffmpeg decodes the JPEG itself, the payload goes through untouched
+        for _ in range(repeat):
+            self.process.stdin.write(frame.data)
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+        # ffmpeg's own CPU time, it does most of the work with this encoder
+        return os.times().children_user + os.times().children_system
+
+ENCODERS = {'cv2': Cv2Encoder, 'ffmpeg': FfmpegEncoder}
+MAX_GAP_SECONDS = 2.0
+
+class VideoSink:
+    def __init__(self, prefix, backend='cv2', fps=30, pts_scale=1e-6, segment_seconds=300, segment_bytes=0, queue_size=64):
+        self.prefix = prefix
+        self.encoder_class = ENCODERS[backend]
+        self.fps = fps
+        self.pts_scale = pts_scale
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.encoder = None
+        # optional metrics.Metrics, gets the per-frame stage times
+        self.metrics = None
+        self.thread = threading.Thread(target=self.run, name="video-sink", daemon=True)
+        self.thread.start()
+
+    def submit(self, pts, data):
+        # copied because the receive buffer is reused for the next frame
+        try:
+            self.queue.put_nowait((pts, bytes(data)))
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            pts, data = item
+            frame = Frame(pts, data)
+            try:
+                self.write(frame)
+            except Exception as e:
+                logging.error(f"Error writing frame {pts} to video: {e}")
+            if self.metrics:
+                self.metrics.stage_times('video', frame.stage_times)
+        self.close_segment()
+
+    def open_segment(self, pts):
+        # a looping or restarted source repeats PTS values, never overwrite
+        # the earlier segment that got the same name
+        path = f"{self.prefix}_{pts}.mp4"
+        suffix = 0
+        while os.path.exists(path):
+            suffix += 1
+            path = f"{self.prefix}_{pts}_{suffix}.mp4"
+        self.encoder = self.encoder_class(path, self.fps)
+        self.segment_start_pts = pts
+        self.segment_frames = 0
+        self.segment_inputs = 0
+        self.segment_cpu = time.thread_time()
+        self.segment_children_cpu = os.times().children_user + os.times().children_system
+        self.segment_wall = time.perf_counter()
+        logging.info(f"Started video segment {path}")
+
+    def close_segment(self):
+        if self.encoder is None:
+            return
+        children_cpu = self.encoder.close()
+        if children_cpu:
+            children_cpu -= self.segment_children_cpu
+        cpu = time.thread_time() - self.segment_cpu + children_cpu
+        wall = time.perf_counter() - self.segment_wall
+        size = os.path.getsize(self.encoder.path) if os.path.exists(self.encoder.path) else 0
+        logging.info(f"Closed {self.encoder.path}: {self.segment_inputs} frames in, {self.segment_frames} written, "
+                     f"{size / 1e6:.1f}MB at {size / max(wall, 1e-9) / 1e6:.2f}MB/s, "
+                     f"{cpu / max(self.segment_inputs, 1) * 1000:.2f}ms CPU per frame, {self.dropped} dropped so far")
+        self.encoder = None
+
+    def write(self, frame):
+        if self.encoder is not None:
+            elapsed = (frame.pts - self.segment_start_pts) * self.pts_scale
+            too_long = self.segment_seconds and elapsed >= self.segment_seconds
+            too_big = self.segment_bytes and os.path.exists(self.encoder.path) and os.path.getsize(self.encoder.path) >= self.segment_bytes
+            # a PTS going backwards means the source restarted, and a long gap
+            # would otherwise be filled with seconds of repeated frames
+            gap = elapsed - self.segment_frames / self.fps
+            if too_long or too_big or elapsed < 0 or gap > MAX_GAP_SECONDS:
+                self.close_segment()
+        if self.encoder is None:
+            self.open_segment(frame.pts)
+        self.segment_inputs += 1
+
+        # constant frame rate output: the frame covers every slot up to its PTS
+        target = int(round((frame.pts - self.segment_start_pts) * self.pts_scale * self.fps)) + 1
+        repeat = target - self.segment_frames
+        if repeat <= 0:
+            # arrived faster than the output frame rate
+            return
+        self.encoder.prepare(frame)
+        if not self.encoder.accepts(frame):
+            logging.info(f"Frame size changed at {frame.pts}, starting a new segment")
+            self.segment_inputs -= 1
+            self.close_segment()
+            return self.write(frame)
+        with frame.stage("encode"):
+            self.encoder.write(frame, repeat)
+        self.segment_frames = target
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
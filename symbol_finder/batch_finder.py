@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# headless batch mode for the symbol finder
+# usage: ./batch_finder.py samples/ -o results.jsonl
+#        ./batch_finder.py 'captures/*.jpg' -o results.csv -j 8
+#
+# the symbol library is built (or refreshed) once in the parent so the
+# descriptor cache is warm, then every pool worker maps the same cache files
+# in its initializer and keeps its own SymbolMatcher for the rest of the run.
+# one result row is written per image: detected symbol names, inlier counts
+# and the projected corners of each symbol.
+
+import os
+import csv
+import glob
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+import cv2
+from symbol_cache import load_symbols
+from symbol_matcher import SymbolMatcher, locate_symbols
+
+log = logging.getLogger("root")
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# per-worker state, set up by init_worker
+worker_sift = None
+worker_symbols = None
+worker_matcher = None
+
+def init_worker(symbols_glob, cache_dir):
+    global worker_sift, worker_symbols, worker_matcher
+    # opencv's own threading just fights with the pool
+    cv2.setNumThreads(1)
+    worker_sift = cv2.SIFT_create()
+    worker_symbols = load_symbols(worker_sift, symbols_glob, cache_dir)
+    worker_matcher = SymbolMatcher(worker_symbols)
+
+def find_in_image(filename):
+    start = time.perf_counter()
+    result = dict(image = filename, detections = [], error = None)
+    test_image = cv2.imread(filename)
+    if test_image is None:
+        result['error'] = "could not read image"
+        return result
+    test_kp, test_des = worker_sift.detectAndCompute(test_image, None)
+    symbol_matches = worker_matcher.match(test_des)
+    for detection in locate_symbols(worker_symbols, symbol_matches, test_kp):
+        result['detections'].append(dict(
+            name = detection['name'],
+            good = len(detection['good']),
+            inliers = detection['inliers'],
+            corners = [[round(x, 2), round(y, 2)] for x, y in detection['corners']],
+        ))
+    result['seconds'] = round(time.perf_counter() - start, 4)
+    return result
+
+def expand_inputs(inputs):
+    filenames = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            paths = glob.glob(os.path.join(entry, '*'))
+        else:
+            paths = glob.glob(entry)
+        filenames += [path for path in paths if path.lower().endswith(IMAGE_EXTENSIONS)]
+    return sorted(set(filenames))
+
+class ResultWriter:
+    # json lines or csv, picked from the output file extension
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='') if path != '-' else None
+        self.csv = None
+        if path.endswith('.csv'):
+            self.csv = csv.writer(self.file)
+            self.csv.writerow(['image', 'symbols', 'inliers', 'corners', 'seconds', 'error'])
+
+    def write(self, result):
+        if self.csv:
+            detections = result['detections']
+            self.csv.writerow([
+                result['image'],
+                ';'.join(d['name'] for d in detections),
+                ';'.join(str(d['inliers']) for d in detections),
+                json.dumps([d['corners'] for d in detections]),
+                result.get('seconds', ''),
+                result['error'] or '',
+            ])
+        else:
+            line = json.dumps(result)
+            if self.file:
+                self.file.write(line + '\n')
+            else:
+                print(line, flush=True)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+def main():
+    parser = argparse.ArgumentParser(description = "Symbol finder batch mode")
+    parser.add_argument('inputs', nargs='+', help="scene images, directories or globs")
+    parser.add_argument('-o', '--output', default='-', help="output file, .csv for csv, anything else is json lines (default stdout)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--symbols', default="./symbols/*.png")
+    parser.add_argument('--cache-dir', default="./.symbol_cache")
+    parser.add_argument('-d', '--debug', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING,
+                        format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+
+    filenames = expand_inputs(args.inputs)
+    if not filenames:
+        log.error(f"No images found in {args.inputs}")
+        return
+    # warm the descriptor cache once so the workers only have to map it
+    load_symbols(cv2.SIFT_create(), args.symbols, args.cache_dir)
+
+    start = time.perf_counter()
+    writer = ResultWriter(args.output)
+    try:
+        with multiprocessing.Pool(args.jobs, initializer=init_worker, initargs=(args.symbols, args.cache_dir)) as pool:
+            # results come back in completion order, each row carries its filename
+            for result in pool.imap_unordered(find_in_image, filenames):
+                writer.write(result)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    log.warning(f"Processed {len(filenames)} images in {elapsed:.2f}s ({len(filenames)/elapsed:.2f} images/s, {args.jobs} workers)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# compare the per-symbol knnMatch loop against SymbolMatcher on the sample images
+# usage: ./bench_matcher.py [-n repeats] [samples/*.jpg]
+
+import glob
+import time
+import argparse
+import logging
+import cv2
+from symbol_cache import load_symbols
+from symbol_matcher import SymbolMatcher, FLANN_INDEX_LINEAR, FLANN_INDEX_KDTREE
+
+log = logging.getLogger("root")
+
+def match_loop(flann, symbols_list, test_des):
+    # the original symbol_finder.main() loop
+    symbol_matches = []
+    for symbol in symbols_list:
+        match_details = dict(name = symbol.name, good = [])
+        if symbol.descriptors is not None:
+            matches = flann.knnMatch(symbol.descriptors, test_des, k=2)
+            for m,n in matches:
+                if m.distance < 0.7*n.distance:
+                    match_details['good'].append(m)
+        symbol_matches.append(match_details)
+    return symbol_matches
+
+def good_pairs(symbol_matches):
+    return set((elem['name'], m.queryIdx, m.trainIdx) for elem in symbol_matches for m in elem['good'])
+
+def best_of(repeats, func, *args):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description = "Symbol matcher benchmark")
+    parser.add_argument('images', nargs='*', default=sorted(glob.glob("./samples/*.jpg")))
+    parser.add_argument('-n', '--repeats', type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    sift = cv2.SIFT_create()
+    symbols_list = load_symbols(sift)
+    loop_flann = cv2.FlannBasedMatcher(dict(algorithm = FLANN_INDEX_LINEAR, trees = 5), dict(checks = 50))
+    engines = [
+        ('combined linear', SymbolMatcher(symbols_list, dict(algorithm = FLANN_INDEX_LINEAR))),
+        ('combined kdtree', SymbolMatcher(symbols_list, dict(algorithm = FLANN_INDEX_KDTREE, trees = 5))),
+    ]
+
+    totals = dict(loop = 0.0)
+    print(f"{'image':40s} {'loop ms':>9s}" + ''.join(f" {name + ' ms':>19s} {'agree':>6s}" for name, _ in engines))
+    for filename in args.images:
+        test_image = cv2.imread(filename)
+        test_kp, test_des = sift.detectAndCompute(test_image, None)
+        loop_time, loop_matches = best_of(args.repeats, match_loop, loop_flann, symbols_list, test_des)
+        reference = good_pairs(loop_matches)
+        totals['loop'] += loop_time
+        line = f"{filename:40s} {loop_time*1000:9.2f}"
+        for name, engine in engines:
+            engine_time, engine_matches = best_of(args.repeats, engine.match, test_des)
+            totals[name] = totals.get(name, 0.0) + engine_time
+            found = good_pairs(engine_matches)
+            # share of the loop's good matches the engine also found
+            agree = len(found & reference) / max(len(reference), 1)
+            line += f" {engine_time*1000:19.2f} {agree:6.1%}"
+        print(line)
+
+    print()
+    for name, total in totals.items():
+        print(f"{name:20s} {total*1000:9.2f} ms total, {totals['loop']/total:5.2f}x vs loop")
+
+if __name__ == '__main__':
+    main()
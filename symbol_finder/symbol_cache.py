@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# on-disk SIFT descriptor cache for the symbol library
+#
+# every symbol gets three .npy files in the cache directory:
+#   <name>-<key>.img.npy  resized grayscale image
+#   <name>-<key>.kp.npy   keypoints as a packed record array
+#   <name>-<key>.des.npy  float32 descriptors (N x 128)
+# the key is a hash of the png contents, the detector parameters and
+# CACHE_VERSION, so changing any of those just misses the cache for that
+# symbol. everything is loaded back with mmap_mode='r' so a warm start only
+# has to map the files instead of rerunning detectAndCompute.
+
+import os
+import re
+import glob
+import hashlib
+import json
+import logging
+import numpy as np
+import cv2
+
+log = logging.getLogger("root")
+
+CACHE_VERSION = 1
+SCALE_PERCENT = 40
+# the names cache_paths produces, nothing else in cache_dir is ever removed
+CACHE_ENTRY = re.compile(r'.+-[0-9a-f]{16}\.(img|kp|des)\.npy')
+
+KEYPOINT_DTYPE = np.dtype([
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('size', '<f4'),
+    ('angle', '<f4'),
+    ('response', '<f4'),
+    ('octave', '<i4'),
+    ('class_id', '<i4'),
+])
+
+class sift_object:
+    def __init__(self, name, image, keypoints, descriptors):
+        self.name = name
+        self.image = image
+        self.keypoints = keypoints
+        self.descriptors = descriptors
+
+def detector_params(sift):
+    # everything that changes the output of detectAndCompute
+    params = dict(opencv = cv2.__version__, scale_percent = SCALE_PERCENT)
+    for getter in ('getNFeatures', 'getNOctaveLayers', 'getContrastThreshold', 'getEdgeThreshold', 'getSigma'):
+        if hasattr(sift, getter):
+            params[getter[3:]] = getattr(sift, getter)()
+    return params
+
+def cache_key(image_bytes, params):
+    h = hashlib.sha256()
+    h.update(f"v{CACHE_VERSION}".encode())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    h.update(image_bytes)
+    return h.hexdigest()[:16]
+
+def keypoints_to_array(keypoints):
+    arr = np.zeros(len(keypoints), dtype=KEYPOINT_DTYPE)
+    for i, kp in enumerate(keypoints):
+        arr[i] = (kp.pt[0], kp.pt[1], kp.size, kp.angle, kp.response, kp.octave, kp.class_id)
+    return arr
+
+def array_to_keypoints(arr):
+    return tuple(cv2.KeyPoint(float(x), float(y), float(size), float(angle), float(response), int(octave), int(class_id))
+                 for x, y, size, angle, response, octave, class_id in arr.tolist())
+
+def compute_symbol(sift, image_bytes):
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+    # resize image
+    new_w = int(image.shape[1] * (SCALE_PERCENT/100.0))
+    new_h = int(image.shape[0] * (SCALE_PERCENT/100.0))
+    new_dim = (new_w, new_h)
+    image = cv2.resize(image, new_dim, interpolation= cv2.INTER_AREA)
+    keypoints, descriptors = sift.detectAndCompute(image, None)
+    return image, keypoints, descriptors
+
+def save_array(path, arr):
+    # write then rename so a crashed run never leaves a truncated entry behind
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, arr)
+    os.replace(tmp_path, path)
+
+def cache_paths(cache_dir, name, key):
+    base = os.path.join(cache_dir, f"{name}-{key}")
+    return base + '.img.npy', base + '.kp.npy', base + '.des.npy'
+
+def load_symbols(sift, symbols_glob="./symbols/*.png", cache_dir="./.symbol_cache"):
+    os.makedirs(cache_dir, exist_ok=True)
+    params = detector_params(sift)
+    symbols_path_list = glob.glob(symbols_glob)
+    symbols_path_list.sort()
+    symbols_list = []
+    live_files = set()
+    recomputed = 0
+    for path in symbols_path_list:
+        name = os.path.basename(path).split('.')[0]
+        with open(path, 'rb') as f:
+            image_bytes = f.read()
+        key = cache_key(image_bytes, params)
+        img_path, kp_path, des_path = cache_paths(cache_dir, name, key)
+        live_files.update(os.path.basename(p) for p in (img_path, kp_path, des_path))
+        if all(os.path.exists(p) for p in (img_path, kp_path, des_path)):
+            log.debug(f"Loading cached sift object for {path}")
+            image = np.load(img_path, mmap_mode='r')
+            keypoints = array_to_keypoints(np.load(kp_path))
+            descriptors = np.load(des_path, mmap_mode='r')
+        else:
+            log.debug(f"Creating sift object from {path}")
+            image, keypoints, descriptors = compute_symbol(sift, image_bytes)
+            save_array(img_path, image)
+            save_array(kp_path, keypoints_to_array(keypoints or ()))
+            save_array(des_path, descriptors if descriptors is not None else np.zeros((0, 128), np.float32))
+            recomputed += 1
+        if len(keypoints) == 0:
+            # match what detectAndCompute hands back for an empty image
+            descriptors = None
+        if type(descriptors) == type(None) or type(keypoints) == type(None):
+            log.warning(f"Warning: keypoints is {repr(keypoints)} and descriptors is {repr(descriptors)}")
+        else:
+            log.info(f"Found {len(keypoints)} keypoints and {len(descriptors)} descriptors in {name}")
+        symbols_list.append(sift_object(name, image, keypoints, descriptors))
+
+    # drop entries for symbols that changed or were removed
+    for entry in os.listdir(cache_dir):
+        if CACHE_ENTRY.fullmatch(entry) and entry not in live_files:
+            log.debug(f"Removing stale cache entry {entry}")
+            os.remove(os.path.join(cache_dir, entry))
+    log.info(f"Loaded {len(symbols_list)} symbols ({recomputed} recomputed)")
+    return symbols_list
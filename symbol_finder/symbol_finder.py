@@ -3,50 +3,21 @@
 # using the tutorial from:
 # https://opencv24-python-tutorials.readthedocs.io/en/latest/py_tutorials/py_feature2d/py_feature_homography/py_feature_homography.html
 
-import os
-import glob
-import numpy as np
 import logging
 # from PIL import Image, ImageEnhance, ImageFilter
 from matplotlib import pyplot as plt
 import cv2
 import argparse
 from utils import aoc_utils as utils
+from symbol_cache import load_symbols
+from symbol_matcher import SymbolMatcher, locate_symbols
 
 # set up root log
 log = logging.getLogger("root")
 
-class sift_object:
-    def __init__(self, name, image, keypoints, descriptors):
-        self.name = name
-        self.image = image
-        self.keypoints = keypoints
-        self.descriptors = descriptors
-
 def generate_symbols(sift):
-    symbols_path_list = glob.glob("./symbols/*.png")
-    # print(symbols_path_list)
-    symbols_path_list.sort()
-    symbols_list = []
-    for path in symbols_path_list:
-        log.debug(f"Creating sift object from {path}")
-        name = os.path.basename(path).split('.')[0]
-        # print(name)
-        image = cv2.imread(path, 0)
-        # resize image
-        scale_percent = 40
-        new_w = int(image.shape[1] * (scale_percent/100.0))
-        new_h = int(image.shape[0] * (scale_percent/100.0))
-        new_dim = (new_w, new_h)
-        image = cv2.resize(image, new_dim, interpolation= cv2.INTER_AREA)
-        keypoints, descriptors = sift.detectAndCompute(image, None)
-        if type(descriptors) == type(None) or type(keypoints) == type(None):
-            log.warning(f"Warning: keypoints is {repr(keypoints)} and descriptors is {repr(descriptors)}")
-        else:
-            log.info(f"Found {len(keypoints)} keypoints and {len(descriptors)} descriptors in {name}")
-        obj = sift_object(name, image, keypoints, descriptors)
-        symbols_list.append(obj)
-    return symbols_list
+    # descriptors are cached on disk, only changed symbols get recomputed
+    return load_symbols(sift, "./symbols/*.png", "./.symbol_cache")
 
 def main():
     utils.init_logging('log_symbol_finder.py')
@@ -66,46 +37,14 @@ def main():
     test_kp, test_des = sift.detectAndCompute(test_image, None)
     log.info(f"Loaded {len(test_kp)} keypoints and {len(test_des)} descriptors from {args.filename}")
 
-    FLANN_INDEX_KDTREE = 0
-    index_params = dict(algorithm = FLANN_INDEX_KDTREE, trees = 5)
-    search_params = dict(checks = 50)
-    
-    flann = cv2.FlannBasedMatcher(index_params, search_params)
-
-    # match for each symbol
-    MIN_MATCH_COUNT = 10
-    symbol_matches = []
-    for symbol in symbols_list:
-        match_details = dict(name = symbol.name, good = [])
-        log.info(f"Matching with {symbol.name}")
-        matches = flann.knnMatch(symbol.descriptors, test_des, k=2)
-
-        # store all good matches per Lowe's ratio test
-        for m,n in matches:
-            if m.distance < 0.7*n.distance:
-                match_details['good'].append(m)
-        log.debug(f"Found {len(match_details['good'])} good matches with {symbol.name}")
-        symbol_matches.append(match_details)
-   
-    MATCH_FEATURE_RATIO = 0.1
-    for index, elem in enumerate(symbol_matches):
-        good = elem['good']
-        name = elem['name']
-        #if len(good) < MIN_MATCH_COUNT:
-        # try dynamic min match count
-        if len(good) < int(MATCH_FEATURE_RATIO * len(symbols_list[index].keypoints))+1:
-            log.debug(f"Not creating match mask for {name}, only {len(good)} matches")
-            continue
-        log.info(f"Finding {name} in image ({len(good)} matches)")
-        src_pts = np.float32([ symbols_list[index].keypoints[m.queryIdx].pt for m in good ]).reshape(-1,1,2)
-        dst_pts = np.float32([ test_kp[m.trainIdx].pt for m in good ]).reshape(-1,1,2)
-
-        M, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC,5.0)
-        matchesMask = mask.ravel().tolist()
+    # one flann index over the scene, all symbols queried in a single pass
+    matcher = SymbolMatcher(symbols_list)
+    symbol_matches = matcher.match(test_des)
 
-        h,w = symbols_list[index].image.shape
-        pts = np.float32([ [0,0],[0,h-1],[w-1,h-1],[w-1,0] ]).reshape(-1,1,2)
-        # dst = cv2.perspectiveTransform(pts,M)
+    for detection in locate_symbols(symbols_list, symbol_matches, test_kp):
+        index = detection['index']
+        good = detection['good']
+        matchesMask = detection['mask'].ravel().tolist()
 
         #test_image_mod = cv2.polylines(test_image,[np.int32(dst)],True,255,3, cv2.LINE_AA) 
         test_image_mod = test_image
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# match the whole symbol library against a scene in one pass
+#
+# the old loop called flann.knnMatch once per symbol, so the search structure
+# over the scene descriptors was rebuilt ~28 times per image. here all symbol
+# descriptors are concatenated once (with a row -> symbol id map), a single
+# FLANN index is built over the scene and every symbol row is queried in one
+# knnSearch call. the ratio test runs on the returned arrays and the good
+# matches are split back out per symbol.
+
+import logging
+import numpy as np
+import cv2
+
+log = logging.getLogger("root")
+
+FLANN_INDEX_LINEAR = 0
+FLANN_INDEX_KDTREE = 1
+RATIO = 0.7
+
+class SymbolMatcher:
+    def __init__(self, symbols_list, index_params=None, search_params=None, ratio=RATIO):
+        self.symbols_list = symbols_list
+        self.index_params = index_params or dict(algorithm = FLANN_INDEX_KDTREE, trees = 5)
+        self.search_params = search_params or dict(checks = 50)
+        self.ratio = ratio
+
+        descriptors = []
+        owners = []
+        offsets = []
+        offset = 0
+        for symbol_id, symbol in enumerate(symbols_list):
+            offsets.append(offset)
+            if symbol.descriptors is None or len(symbol.descriptors) == 0:
+                continue
+            descriptors.append(np.asarray(symbol.descriptors, dtype=np.float32))
+            owners.append(np.full(len(symbol.descriptors), symbol_id, dtype=np.int32))
+            offset += len(symbol.descriptors)
+        if descriptors:
+            self.descriptors = np.ascontiguousarray(np.concatenate(descriptors))
+            self.owners = np.concatenate(owners)
+        else:
+            self.descriptors = np.zeros((0, 128), np.float32)
+            self.owners = np.zeros(0, np.int32)
+        # first library row of each symbol, used to turn global rows back into queryIdx
+        self.offsets = np.array(offsets, dtype=np.int64)
+        log.debug(f"Built symbol library with {len(self.descriptors)} descriptors from {len(symbols_list)} symbols")
+
+    def match(self, test_des):
+        # returns [dict(name=..., good=[DMatch, ...]), ...] in symbols_list order,
+        # the same shape the per-symbol loop produced
+        symbol_matches = [dict(name = symbol.name, good = []) for symbol in self.symbols_list]
+        if test_des is None or len(test_des) < 2 or len(self.descriptors) == 0:
+            return symbol_matches
+
+        index = cv2.flann_Index(np.asarray(test_des, dtype=np.float32), self.index_params)
+        indices, dists = index.knnSearch(self.descriptors, 2, params=self.search_params)
+        # flann hands back squared L2 distances
+        dists = np.sqrt(dists)
+
+        # store all good matches per Lowe's ratio test
+        good_rows = np.flatnonzero(dists[:, 0] < self.ratio * dists[:, 1])
+        for row in good_rows.tolist():
+            symbol_id = int(self.owners[row])
+            m = cv2.DMatch(row - int(self.offsets[symbol_id]), int(indices[row, 0]), float(dists[row, 0]))
+            symbol_matches[symbol_id]['good'].append(m)
+        for match_details in symbol_matches:
+            log.debug(f"Found {len(match_details['good'])} good matches with {match_details['name']}")
+        return symbol_matches
+
+MATCH_FEATURE_RATIO = 0.1
+
+def locate_symbols(symbols_list, symbol_matches, test_kp):
+    # run the homography step for every symbol with enough good matches.
+    # returns one dict per detection with the homography, inlier mask and the
+    # symbol outline projected into the scene
+    detections = []
+    for index, elem in enumerate(symbol_matches):
+        good = elem['good']
+        name = elem['name']
+        # try dynamic min match count
+        # findHomography needs at least 4 point pairs
+        if len(good) < max(4, int(MATCH_FEATURE_RATIO * len(symbols_list[index].keypoints))+1):
+            log.debug(f"Not creating match mask for {name}, only {len(good)} matches")
+            continue
+        log.info(f"Finding {name} in image ({len(good)} matches)")
+        src_pts = np.float32([ symbols_list[index].keypoints[m.queryIdx].pt for m in good ]).reshape(-1,1,2)
+        dst_pts = np.float32([ test_kp[m.trainIdx].pt for m in good ]).reshape(-1,1,2)
+
+        M, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC,5.0)
+        if M is None:
+            log.debug(f"No homography found for {name}")
+            continue
+
+        h,w = symbols_list[index].image.shape
+        pts = np.float32([ [0,0],[0,h-1],[w-1,h-1],[w-1,0] ]).reshape(-1,1,2)
+        dst = cv2.perspectiveTransform(pts,M)
+        detections.append(dict(
+            index = index,
+            name = name,
+            good = good,
+            homography = M,
+            mask = mask,
+            inliers = int(mask.sum()),
+            corners = dst.reshape(-1,2).tolist(),
+        ))
+    return detections